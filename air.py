@@ -1,14 +1,23 @@
 from dotenv import load_dotenv
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException
-from urllib.parse import urlparse, parse_qs
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+from urllib.parse import urlparse, parse_qs, urljoin
 from datetime import datetime
 from pymongo import MongoClient
-import os, time
+from chrome_startup import create_driver
+from driver_pool import get_pool
+from fixtures import record_page, recording
+from bs4 import BeautifulSoup
+from resource_blocking import with_profile, install_blocking
+from pipeline import Pipeline, MongoSink
+from records import cop, decimal
+from readiness import install_network_tracker, wait_until_ready
+import metrics
+import profiling
+import os, re
 
 # Cargar variables de entorno
 load_dotenv()
@@ -23,77 +32,239 @@ chrome_options.add_argument('--window-size=1920,1080')
 chrome_options.add_argument('--disable-blink-features=AutomationControlled')
 chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
 
-driver = webdriver.Chrome(options=chrome_options)
-wait = WebDriverWait(driver, 15)
+# Origen del sitio; AIRBNB_BASE_URL permite apuntar al servidor de réplica local
+BASE_URL = os.environ.get("AIRBNB_BASE_URL", "https://www.airbnb.com.co")
+URL = (BASE_URL + "/s/Ibagué--Tolima/homes?refinement_paths%5B%5D=%2Fhomes&flexible_trip_lengths%5B%5D=one_week&monthly_start_date=2025-05-01&monthly_length=3&monthly_end_date=2025-08-01&price_filter_input_type=2&channel=EXPLORE&acp_id=88865183-8fb8-4e57-9bf9-d2bb636750ab&date_picker_type=calendar&checkin=2025-04-26&checkout=2025-04-30&source=structured_search_input_header&search_type=autocomplete_click&price_filter_num_nights=4&place_id=ChIJw4N9lwnEOI4RjnG5Vu4_b-E&location_bb=QJZfMcKV7jxAiDw2wpcLNw%3D%3D")
 
-# Conexión a MongoDB
-mongo_uri = os.environ.get("MONGO_URI")
-client = MongoClient(mongo_uri)
-db = client["test"]  # Asegúrate que es la base correcta en Railway
-hotels_col = db["hotels"]
+CARD_SELECTOR = "[data-testid='card-container']"
+PRICE_SELECTOR = "div[style*='--pricing'] > div > span > div > span"
+RATING_XPATH = ".//span[contains(text(), 'Calificación promedio')]"
 
-try:
-    url = ("https://www.airbnb.com.co/s/Ibagué--Tolima/homes?refinement_paths%5B%5D=%2Fhomes&flexible_trip_lengths%5B%5D=one_week&monthly_start_date=2025-05-01&monthly_length=3&monthly_end_date=2025-08-01&price_filter_input_type=2&channel=EXPLORE&acp_id=88865183-8fb8-4e57-9bf9-d2bb636750ab&date_picker_type=calendar&checkin=2025-04-26&checkout=2025-04-30&source=structured_search_input_header&search_type=autocomplete_click&price_filter_num_nights=4&place_id=ChIJw4N9lwnEOI4RjnG5Vu4_b-E&location_bb=QJZfMcKV7jxAiDw2wpcLNw%3D%3D")
-    driver.get(url)
+LINK_SELECTOR = "a[href*='/rooms/']"
 
-    print("🔎 Cargando resultados de Airbnb...")
-    for _ in range(5):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(3)
+# Escritura en MongoDB por lotes (documentos por bulk_write y segundos máximos en el búfer)
+MONGO_BATCH_SIZE = 100
+MONGO_FLUSH_INTERVAL = 5.0
 
-    cards = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "[data-testid='card-container']")))
-    print(f"📌 Se encontraron {len(cards)} alojamientos\n")
+# Directorio para exportar también a Parquet (vacío = solo MongoDB)
+PARQUET_DIR = os.environ.get("PARQUET_DIR")
 
-    for index, card in enumerate(cards, 1):
-        try:
-            title = card.find_element(By.CSS_SELECTOR, "[data-testid='listing-card-name']").text.strip()
-            if not title:
-                continue
-
-            try:
-                description = card.find_element(By.CSS_SELECTOR, "[data-testid='listing-card-title']").text.strip()
-            except:
-                description = "N/A"
-
-            try:
-                price_elem = card.find_element(By.CSS_SELECTOR, "div[style*='--pricing'] > div > span > div > span")
-                price_text = price_elem.text.strip().replace(" por noche", "").replace("$", "").replace(",", "")
-                price = float(price_text.split()[0]) if price_text else 0
-            except:
-                price = 0
-
-            try:
-                rating_elem = card.find_element(By.XPATH, ".//span[contains(text(), 'Calificación promedio')]")
-                rating = float(rating_elem.text.replace("Calificación promedio: ", "").strip())
-            except:
-                rating = 1.0
-
-            try:
-                img_url = card.find_element(By.TAG_NAME, "img").get_attribute("src")
-            except:
-                img_url = None
-
-            hotel = {
-                "nombre": title,
-                "ciudad": "Bucaramanga",
-                "precio": price,
-                "rating": rating,
-                "descripcion": description,
-                "ubicacion": "",
-                "facilidades": [],
-                "opiniones": [],
-                "imagenes": [img_url] if img_url else []
-            }
-
-            hotels_col.insert_one(hotel)
-            print(f"✅ Guardado en MongoDB: {title}")
+# Extraer todas las tarjetas con un solo execute_script (False = un find_element por campo)
+USE_SCRIPT_EXTRACTION = True
+
+CARDS_JS = """
+var price = arguments[1], rating = arguments[2], link = arguments[3];
+return arguments[0].map(function (card) {
+  var text = function (el) { return el ? el.innerText.trim() : null; };
+  var ratingNode = document.evaluate(rating, card, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+  var img = card.querySelector('img');
+  var anchor = card.querySelector(link);
+  return {
+    title: text(card.querySelector("[data-testid='listing-card-name']")),
+    description: text(card.querySelector("[data-testid='listing-card-title']")),
+    price: text(card.querySelector(price)),
+    rating: text(ratingNode),
+    img: img ? img.src : null,
+    url: anchor ? anchor.href : null
+  };
+});
+"""
+
+
+def configurar_selenium(bloquear_recursos=None):
+    """Configura el navegador Chrome para Selenium (con el perfil de bloqueo de recursos de Airbnb)"""
+    driver = create_driver(with_profile(chrome_options, "airbnb", bloquear_recursos))
+    install_blocking(driver, "airbnb", bloquear_recursos)
+    return driver
+
+
+def obtener_pool():
+    """Devuelve el pool de navegadores compartido de Airbnb"""
+    return get_pool("airbnb", configurar_selenium)
+
+
+def iterar_alojamientos(url):
+    """Generador de alojamientos de una búsqueda de Airbnb; el navegador vuelve al pool antes del primero"""
+    with obtener_pool().checkout() as driver:
+        wait = WebDriverWait(driver, 15)
+        install_network_tracker(driver)
+        with metrics.stage("airbnb", "get"):
+            driver.get(url)
+
+        print("🔎 Cargando resultados de Airbnb...")
+        cargados = 0
+        with metrics.stage("airbnb", "scroll"):
+            for _ in range(5):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                # Cada scroll espera a que las tarjetas dejen de cambiar (máximo 3 s)
+                total = wait_until_ready(driver, CARD_SELECTOR, timeout=3, label="airbnb scroll")
+                if total and total == cargados:
+                    break  # El scroll ya no carga más alojamientos
+                cargados = total
+
+        with metrics.stage("airbnb", "wait"):
+            cards = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, CARD_SELECTOR)))
+        print(f"📌 Se encontraron {len(cards)} alojamientos\n")
+        if recording():
+            record_page("airbnb", url, driver.page_source)
+        with metrics.stage("airbnb", "extract"):
+            tarjetas = extraer_tarjetas(driver, cards)
 
+    for index, datos in enumerate(tarjetas, 1):
+        try:
+            hotel = construir_hotel(datos)
         except Exception as e:
             print(f"❌ Error procesando alojamiento #{index}: {e}")
+            metrics.error("airbnb", "build")
+            continue
+        if hotel is None:
+            continue
+
+        print(f"✅ Procesado: {hotel['nombre']}")
+        metrics.incr("airbnb", "records")
+        yield hotel
+
+
+def extraer_tarjetas(driver, cards, use_script=USE_SCRIPT_EXTRACTION):
+    """Lee los campos de todas las tarjetas; con `use_script` en una sola llamada a execute_script"""
+    if use_script:
+        try:
+            datos = driver.execute_script(CARDS_JS, cards, PRICE_SELECTOR, RATING_XPATH, LINK_SELECTOR)
+            if isinstance(datos, list):
+                return datos
+            print("⚠️ La extracción por script no devolvió datos, usando extracción por elemento")
+        except WebDriverException as e:
+            print(f"⚠️ Falló la extracción por script, usando extracción por elemento: {e}")
+
+    datos = []
+    for index, card in enumerate(cards, 1):
+        try:
+            datos.append(extraer_tarjeta(card))
+        except WebDriverException as e:
+            print(f"❌ Error leyendo alojamiento #{index}: {e}")
+    return datos
+
+
+def extraer_tarjeta(card):
+    """Lee los campos de una tarjeta elemento por elemento (un viaje a chromedriver por campo)"""
+    def texto(by, selector):
+        try:
+            return card.find_element(by, selector).text
+        except NoSuchElementException:
+            return None
+
+    def atributo(by, selector, nombre):
+        try:
+            return card.find_element(by, selector).get_attribute(nombre)
+        except NoSuchElementException:
+            return None
+
+    return {
+        "title": texto(By.CSS_SELECTOR, "[data-testid='listing-card-name']"),
+        "description": texto(By.CSS_SELECTOR, "[data-testid='listing-card-title']"),
+        "price": texto(By.CSS_SELECTOR, PRICE_SELECTOR),
+        "rating": texto(By.XPATH, RATING_XPATH),
+        "img": atributo(By.TAG_NAME, "img", "src"),
+        "url": atributo(By.CSS_SELECTOR, LINK_SELECTOR, "href"),
+    }
+
+
+def parsear_tarjetas_html(html, base_url=URL):
+    """Lee los campos de las tarjetas desde un page_source guardado (mismos campos que CARDS_JS)"""
+    soup = BeautifulSoup(html, "html.parser")
+    datos = []
+    for card in soup.select(CARD_SELECTOR):
+        def texto(selector):
+            elemento = card.select_one(selector)
+            return elemento.get_text(" ", strip=True) if elemento else None
+
+        rating = card.find("span", string=re.compile("Calificación promedio"))
+        img = card.find("img")
+        enlace = card.select_one(LINK_SELECTOR)
+        datos.append({
+            "title": texto("[data-testid='listing-card-name']"),
+            "description": texto("[data-testid='listing-card-title']"),
+            "price": texto(PRICE_SELECTOR),
+            "rating": rating.get_text(strip=True) if rating else None,
+            "img": urljoin(base_url, img["src"]) if img and img.get("src") else None,
+            "url": urljoin(base_url, enlace["href"]) if enlace and enlace.get("href") else None,
+        })
+    return datos
+
+
+def parsear_alojamientos_html(html):
+    """Documentos de alojamiento de un page_source guardado (la mitad de parseo de iterar_alojamientos)"""
+    hoteles = (construir_hotel(datos) for datos in parsear_tarjetas_html(html))
+    return [hotel for hotel in hoteles if hotel is not None]
+
+
+def clave_alojamiento(hotel):
+    """Clave estable del alojamiento: id del anuncio o, si no hay enlace, nombre + ciudad"""
+    listing = re.search(r"/rooms/(\d+)", hotel.get("url") or "")
+    if listing:
+        return f"airbnb:{listing.group(1)}"
+    return f"airbnb:{hotel['nombre'].lower()}|{hotel['ciudad'].lower()}"
+
+
+def construir_hotel(datos):
+    """Convierte los campos crudos de una tarjeta en el documento de MongoDB"""
+    title = (datos.get("title") or "").strip()
+    if not title:
+        return None
+
+    description = datos.get("description")
+    description = description.strip() if description is not None else "N/A"
+
+    # Precio en COP entero ("$120.000 por noche" -> 120000) y None si falta algún dato
+    price = cop(datos.get("price"))
+    rating = decimal(datos.get("rating"))
+
+    img_url = datos.get("img")
+    url = datos.get("url")
+
+    return {
+        "nombre": title,
+        "url": url.split("?")[0] if url else None,
+        "ciudad": "Bucaramanga",
+        "precio": price,
+        "rating": rating,
+        "descripcion": description,
+        "ubicacion": "",
+        "facilidades": [],
+        "opiniones": [],
+        "imagenes": [img_url] if img_url else []
+    }
+
+
+def main():
+    # Conexión a MongoDB
+    mongo_uri = os.environ.get("MONGO_URI")
+    client = MongoClient(mongo_uri)
+    db = client["test"]  # Asegúrate que es la base correcta en Railway
+    hotels_col = db["hotels"]
+
+    # Los upserts por lotes corren en el hilo del sink; el scraping solo encola
+    sink = MongoSink(hotels_col, clave_alojamiento,
+                     batch_size=MONGO_BATCH_SIZE, flush_interval=MONGO_FLUSH_INTERVAL)
+    sinks = [sink]
+    if PARQUET_DIR:
+        from columnar import ParquetSink
+
+        sinks.append(ParquetSink(PARQUET_DIR, provider="airbnb"))
+    pipeline = Pipeline(sinks)
+    try:
+        pipeline.feed(iterar_alojamientos(URL))
+    except Exception as e:
+        print(f"❌ Error general: {e}")
+    finally:
+        pipeline.close()
+        stats = sink.writer.stats
+        print(f"💾 MongoDB: {stats['inserted']} nuevos, {stats['updated']} actualizados, "
+              f"{stats['unchanged']} sin cambios, {stats['errors']} errores")
+        client.close()
+        metrics.export()
 
-except Exception as e:
-    print(f"❌ Error general: {e}")
 
-finally:
-    driver.quit()
-    client.close()
+if __name__ == "__main__":
+    with profiling.from_argv("airbnb"):
+        main()
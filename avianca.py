@@ -1,12 +1,22 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException, ElementClickInterceptedException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException, ElementClickInterceptedException, StaleElementReferenceException
+from chrome_startup import create_driver
+from driver_pool import get_pool
+from fixtures import record_page, record_response, recording
+from bs4 import BeautifulSoup
+from resource_blocking import with_profile, install_blocking
+from readiness import install_network_tracker, wait_until_ready, wait_for_count
+from urllib.parse import urlencode
+import base64
+import json
 import logging
+import metrics
+import os
+import profiling
+import re
 import time
 import random
 
@@ -26,9 +36,78 @@ chrome_options.add_argument('--disable-blink-features=AutomationControlled')
 chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
 chrome_options.add_argument('--accept-language=es-ES,es;q=0.9,en;q=0.8')
 
+# Leer las tarifas de la respuesta JSON de disponibilidad (False = solo el DOM)
+USE_NETWORK_CAPTURE = True
+if USE_NETWORK_CAPTURE:
+    # El log de rendimiento expone los eventos de red de CDP (Network.*)
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
 MAX_RETRIES = 5  # Número máximo de reintentos
 BASE_WAIT_TIME = 45
 MAX_WAIT_TIME = 120
+FLIGHT_SELECTOR = 'div.journey_inner.target-conections-reviewer'
+SHOW_MORE_CLASS = 'FB566-MoreFlightsBtn'
+MAX_SHOW_MORE_CLICKS = 20  # Tope de clics en "Mostrar más vuelos" por búsqueda
+SHOW_MORE_TIMEOUT = 5  # Segundos máximos esperando vuelos nuevos tras cada clic
+FIRST_FLIGHTS_TIMEOUT = 10  # Segundos máximos esperando los primeros vuelos antes de buscar el botón
+
+# Campo -> selector CSS dentro de cada vuelo
+FLIGHT_FIELDS = {
+    'hora_salida': 'div.journey-schedule_time.journey-schedule_time-departure',
+    'hora_llegada': 'div.journey-schedule_time.journey-schedule_time-return',
+    'duracion': 'div.journey-schedule_duration_time',
+    'tipo_vuelo': 'span.button_label.ng-star-inserted',
+    'precio': 'span.price.text-space-gap',
+}
+
+# Extraer todos los vuelos con un solo execute_script (False = un find_element por campo)
+USE_SCRIPT_EXTRACTION = True
+
+# Devuelve null para los vuelos a los que les falta algún campo, igual que extract_flight_info
+FLIGHTS_JS = """
+var fields = arguments[1];
+return arguments[0].map(function (vuelo) {
+  var info = {};
+  for (var field in fields) {
+    var el = vuelo.querySelector(fields[field]);
+    if (!el) return null;
+    info[field] = el.innerText.trim();
+  }
+  return info;
+});
+"""
+
+# Respuestas de red que se consideran de disponibilidad
+AVAILABILITY_URL_PATTERN = re.compile(r'availability|/flights?/search|/journeys', re.IGNORECASE)
+AVAILABILITY_TIMEOUT = 10
+
+# Claves candidatas en el JSON de disponibilidad
+DEPARTURE_KEYS = ('std', 'departureDateTime', 'departureDate', 'departureTime', 'departure')
+ARRIVAL_KEYS = ('sta', 'arrivalDateTime', 'arrivalDate', 'arrivalTime', 'arrival')
+DURATION_KEYS = ('duration', 'journeyDuration', 'flightDuration', 'totalDuration')
+FARE_KEYS = ('fares', 'fareFamilies', 'bundles', 'prices')
+FARE_NAME_KEYS = ('fareFamily', 'fareFamilyName', 'bundleCode', 'name', 'code')
+AMOUNT_KEYS = ('amount', 'totalAmount', 'total', 'price', 'value')
+SEGMENT_KEYS = ('segments', 'legs', 'flights')
+
+# Origen del sitio; AVIANCA_BASE_URL permite apuntar al servidor de réplica local
+BASE_URL = os.environ.get('AVIANCA_BASE_URL', 'https://www.avianca.com')
+SEARCH_PATH = '/es/booking/select/'
+
+def build_url(origin, destination, departure, adults=1):
+    """Construir la URL de búsqueda de solo ida (códigos IATA, fecha AAAA-MM-DD)"""
+    params = {
+        'origin1': origin.upper(),
+        'destination1': destination.upper(),
+        'departure1': departure,
+        'adt1': adults,
+        'tng1': 0,
+        'chd1': 0,
+        'inf1': 0,
+        'currency': 'COP',
+        'posCode': 'CO',
+    }
+    return f'{BASE_URL}{SEARCH_PATH}?{urlencode(params)}'
 
 def get_exponential_backoff(attempt):
     """Calcular el tiempo de retroceso exponencial con jitter"""
@@ -36,16 +115,23 @@ def get_exponential_backoff(attempt):
     jitter = random.uniform(0, 0.1 * base_delay)  # 10% de jitter
     return base_delay + jitter
 
-def setup_driver():
-    """Configuración y lanzamiento del navegador"""
+def setup_driver(block_resources=None):
+    """Configuración y lanzamiento del navegador (con el perfil de bloqueo de recursos de Avianca)"""
     try:
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        options = with_profile(chrome_options, 'avianca', block_resources)
+        # La ruta de chromedriver se resuelve una vez por proceso, no en cada reintento
+        driver = create_driver(options)
+        install_blocking(driver, 'avianca', block_resources)
         driver.set_page_load_timeout(BASE_WAIT_TIME)
         return driver
     except Exception as e:
         logging.error(f'Error al configurar el navegador: {e}')
         raise
 
+def get_driver_pool():
+    """Pool de navegadores compartido de Avianca"""
+    return get_pool('avianca', setup_driver)
+
 def handle_cookie_consent(driver):
     """Manejar el banner de consentimiento de cookies"""
     try:
@@ -81,59 +167,64 @@ def scroll_to_element(driver, element):
     except Exception as e:
         logging.warning(f'Error al desplazar hacia el elemento: {e}')
 
-def click_show_more_button(driver):
-    """Hacer clic en el botón 'Mostrar más vuelos' hasta que todos los vuelos estén cargados"""
-    max_attempts = 3
-    retry_delay = 2
+def find_show_more_button(driver):
+    """Botón 'Mostrar más vuelos' si está presente y visible (sin esperas)"""
+    for button in driver.find_elements(By.CLASS_NAME, SHOW_MORE_CLASS):
+        try:
+            if button.is_displayed() and button.is_enabled():
+                return button
+        except StaleElementReferenceException:
+            continue
+    return None
+
+def click_show_more_button(driver, max_clicks=MAX_SHOW_MORE_CLICKS, timeout=SHOW_MORE_TIMEOUT):
+    """Hacer clic en 'Mostrar más vuelos' mientras aparezcan vuelos nuevos; devuelve el número de clics"""
+    started = time.monotonic()
+    clicks = 0
+    # Antes de buscar el botón, esperar a que haya resultados en la página
+    loaded = wait_for_count(driver, FLIGHT_SELECTOR, 1, timeout=FIRST_FLIGHTS_TIMEOUT, label='primeros vuelos')
 
     try:
         while True:
-            try:
-                # Esperar a que el botón esté presente
-                button = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, 'FB566-MoreFlightsBtn'))
-                )
-
-                # Desplazar el botón a la vista
-                scroll_to_element(driver, button)
-
-                # Intentar hacer clic en el botón
-                for attempt in range(max_attempts):
-                    try:
-                        # Esperar a que el botón sea clickeable
-                        button = WebDriverWait(driver, 5).until(
-                            EC.element_to_be_clickable((By.CLASS_NAME, 'FB566-MoreFlightsBtn'))
-                        )
-                        button.click()
-                        break
-                    except ElementClickInterceptedException:
-                        # Si no se puede hacer clic normalmente, intentar hacer clic con JavaScript
-                        driver.execute_script('arguments[0].click();', button)
-                        break
-                    except Exception as e:
-                        if attempt == max_attempts - 1:
-                            raise
-                        time.sleep(retry_delay)
-
-                logging.info('Hizo clic en el botón "Mostrar más vuelos"')
-                time.sleep(5)  # Esperar a que se carguen los nuevos vuelos
+            if clicks >= max_clicks:
+                logging.info(f'Se alcanzó el máximo de {max_clicks} clics en "Mostrar más vuelos"')
+                break
 
-            except TimeoutException:
+            button = find_show_more_button(driver)
+            if button is None:
                 logging.info('No se encontró más el botón "Mostrar más vuelos". Todos los vuelos están cargados.')
                 break
 
+            try:
+                driver.execute_script('arguments[0].scrollIntoView({block: "center"});', button)
+                button.click()
+            except ElementClickInterceptedException:
+                # Si no se puede hacer clic normalmente, intentar hacer clic con JavaScript
+                driver.execute_script('arguments[0].click();', button)
+            except StaleElementReferenceException:
+                continue  # El botón se volvió a renderizar; se busca de nuevo
+            clicks += 1
+            logging.info(f'Hizo clic en el botón "Mostrar más vuelos" ({clicks}, {loaded} vuelos cargados)')
+
+            # Seguir en cuanto crezca el número de vuelos
+            count = wait_for_count(driver, FLIGHT_SELECTOR, loaded + 1, timeout=timeout, label='mostrar más vuelos')
+            if count <= loaded:
+                logging.info('El clic no cargó vuelos nuevos; fin de la paginación')
+                break
+            loaded = count
+
     except Exception as e:
         logging.error(f'Error en click_show_more_button: {e}')
 
+    logging.info(f'Paginación: {clicks} clics, {loaded} vuelos en {time.monotonic() - started:.1f}s')
+    return clicks
+
 def extract_flight_info(vuelo):
     """Extraer la información del vuelo"""
     try:
         info = {
-            'hora_salida': vuelo.find_element(By.CSS_SELECTOR, 'div.journey-schedule_time.journey-schedule_time-departure').text,
-            'hora_llegada': vuelo.find_element(By.CSS_SELECTOR, 'div.journey-schedule_time.journey-schedule_time-return').text,
-            'duracion': vuelo.find_element(By.CSS_SELECTOR, 'div.journey-schedule_duration_time').text,
-            'tipo_vuelo': vuelo.find_element(By.CSS_SELECTOR, 'span.button_label.ng-star-inserted').text,
-            'precio': vuelo.find_element(By.CSS_SELECTOR, 'span.price.text-space-gap').text
+            field: vuelo.find_element(By.CSS_SELECTOR, selector).text
+            for field, selector in FLIGHT_FIELDS.items()
         }
         return info
     except NoSuchElementException as e:
@@ -143,71 +234,262 @@ def extract_flight_info(vuelo):
         logging.error(f'Error al extraer la información del vuelo: {e}')
         return None
 
+def extract_flights(driver, vuelos, use_script=USE_SCRIPT_EXTRACTION):
+    """Extraer la información de todos los vuelos; con `use_script` en un solo execute_script"""
+    if use_script:
+        try:
+            infos = driver.execute_script(FLIGHTS_JS, vuelos, FLIGHT_FIELDS)
+            if isinstance(infos, list):
+                missing = sum(1 for info in infos if info is None)
+                if missing:
+                    logging.error(f'Elementos no encontrados en {missing} vuelos')
+                return [info for info in infos if info]
+            logging.warning('La extracción por script no devolvió datos, usando extracción por elemento')
+        except WebDriverException as e:
+            logging.warning(f'Falló la extracción por script, usando extracción por elemento: {e}')
+
+    infos = (extract_flight_info(vuelo) for vuelo in vuelos)
+    return [info for info in infos if info]
+
+def parse_flights_html(html):
+    """Extraer los vuelos de un page_source guardado (mismos selectores que extract_flight_info)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    flights = []
+    for vuelo in soup.select(FLIGHT_SELECTOR):
+        info = {}
+        for field, selector in FLIGHT_FIELDS.items():
+            element = vuelo.select_one(selector)
+            if element is None:
+                break
+            info[field] = element.get_text(' ', strip=True)
+        else:
+            flights.append(info)
+    return flights
+
+def drain_performance_log(driver):
+    """Leer (y vaciar) los eventos acumulados en el log de rendimiento"""
+    try:
+        return driver.get_log('performance')
+    except WebDriverException:
+        return []
+
+def capture_availability(driver, timeout=AVAILABILITY_TIMEOUT):
+    """Esperar las respuestas JSON de disponibilidad y devolver sus cuerpos parseados"""
+    deadline = time.monotonic() + timeout
+    pending = {}  # requestId -> url de las respuestas aún no terminadas
+    bodies = []
+    while time.monotonic() < deadline:
+        for entry in drain_performance_log(driver):
+            message = json.loads(entry['message'])['message']
+            params = message.get('params', {})
+            if message.get('method') == 'Network.responseReceived':
+                response = params.get('response', {})
+                if 'json' in response.get('mimeType', '') and AVAILABILITY_URL_PATTERN.search(response.get('url', '')):
+                    pending[params['requestId']] = response['url']
+            elif message.get('method') == 'Network.loadingFinished' and params.get('requestId') in pending:
+                response_url = pending.pop(params['requestId'])
+                try:
+                    body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+                    text = base64.b64decode(body['body']) if body.get('base64Encoded') else body['body']
+                    bodies.append(json.loads(text))
+                    metrics.incr('avianca', 'response_bytes', len(text))
+                    if recording():
+                        record_response('avianca', response_url, text)
+                    logging.info(f'Respuesta de disponibilidad capturada: {response_url}')
+                except (WebDriverException, ValueError) as e:
+                    logging.warning(f'No se pudo leer la respuesta {response_url}: {e}')
+        if bodies and not pending:
+            break
+        time.sleep(0.25)
+    return bodies
+
+def _walk_json(node):
+    """Recorrer todos los diccionarios de un JSON"""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk_json(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_json(value)
+
+def _first_value(node, keys):
+    """Primer valor no vacío entre las claves candidatas"""
+    for key in keys:
+        if node.get(key) not in (None, '', [], {}):
+            return node[key]
+    return None
+
+def _fare_amount(fare):
+    """Importe de una tarifa, que puede venir anidado ({'price': {'amount': ...}})"""
+    value = _first_value(fare, AMOUNT_KEYS)
+    if isinstance(value, dict):
+        return _fare_amount(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _clock_time(value):
+    """'2025-04-14T06:05:00' -> '06:05'; otros formatos se devuelven tal cual"""
+    match = re.search(r'T?(\d{2}:\d{2})', str(value))
+    return match.group(1) if match else str(value)
+
+def parse_availability(bodies):
+    """Extraer los vuelos (con sus tarifas numéricas) de las respuestas de disponibilidad"""
+    flights = []
+    seen = set()
+    for body in bodies:
+        for node in _walk_json(body):
+            departure = _first_value(node, DEPARTURE_KEYS)
+            arrival = _first_value(node, ARRIVAL_KEYS)
+            fares = _first_value(node, FARE_KEYS)
+            if not (departure and arrival and isinstance(fares, list)):
+                continue
+
+            prices = {}
+            for fare in fares:
+                if isinstance(fare, dict):
+                    amount = _fare_amount(fare)
+                    if amount is not None:
+                        name = _first_value(fare, FARE_NAME_KEYS) or f'tarifa_{len(prices) + 1}'
+                        prices[str(name)] = amount
+            if not prices:
+                continue
+
+            key = (str(departure), str(arrival), tuple(sorted(prices.items())))
+            if key in seen:
+                continue
+            seen.add(key)
+
+            segments = _first_value(node, SEGMENT_KEYS)
+            stops = len(segments) - 1 if isinstance(segments, list) else None
+            flights.append({
+                'hora_salida': _clock_time(departure),
+                'hora_llegada': _clock_time(arrival),
+                'duracion': str(_first_value(node, DURATION_KEYS) or ''),
+                'tipo_vuelo': '' if stops is None else ('Directo' if stops == 0 else f'{stops} escala(s)'),
+                'precio': min(prices.values()),
+                'tarifas': prices,
+            })
+    return flights
+
 def scrape_flights(url):
-    """Scraping de vuelos"""
+    """Scraping de vuelos; devuelve la lista de vuelos extraídos (vacía si el scraping falla)"""
+    try:
+        return list(iter_flights(url))
+    except Exception:
+        return []  # El error ya quedó registrado en iter_flights
+
+def iter_flights(url):
+    """Generador de vuelos; el navegador vuelve al pool antes de entregar el primer registro"""
+    pool = get_driver_pool()
     driver = None
+    flights = []
     try:
         for attempt in range(MAX_RETRIES):
             try:
                 if driver is None:
-                    driver = setup_driver()
+                    driver = pool.acquire()
 
                 wait_time = get_exponential_backoff(attempt)
                 logging.info(f'Intento {attempt + 1} de {MAX_RETRIES} (tiempo de espera: {wait_time:.2f}s)')
 
-                driver.get(url)
-                time.sleep(2)  # Pausa breve después de cargar la página
+                install_network_tracker(driver)
+                if USE_NETWORK_CAPTURE:
+                    drain_performance_log(driver)  # Descartar eventos de trabajos anteriores del pool
+                with metrics.stage('avianca', 'get'):
+                    driver.get(url)
+                with metrics.stage('avianca', 'wait'):
+                    wait_until_ready(driver, timeout=2, label='avianca')  # Pausa breve después de cargar la página
 
                 # Manejar el consentimiento de cookies
-                handle_cookie_consent(driver)
+                with metrics.stage('avianca', 'cookies'):
+                    handle_cookie_consent(driver)
+
+                # Leer las tarifas directamente de la respuesta de disponibilidad, sin paginar el DOM
+                if USE_NETWORK_CAPTURE:
+                    with metrics.stage('avianca', 'capture'):
+                        bodies = capture_availability(driver)
+                    with metrics.stage('avianca', 'parse'):
+                        flights = parse_availability(bodies)
+                    if flights:
+                        if recording():
+                            record_page('avianca', url, driver.page_source)
+                        logging.info(f'{len(flights)} vuelos obtenidos de la respuesta de disponibilidad')
+                        for info in flights:
+                            logging.info(f'Detalles del vuelo: {info}')
+                        break
+                    logging.info('No se capturó la disponibilidad, se extraen los vuelos del DOM')
 
                 # Hacer clic en el botón "Mostrar más vuelos" hasta que todos los vuelos estén cargados
-                click_show_more_button(driver)
+                with metrics.stage('avianca', 'show_more'):
+                    click_show_more_button(driver)
 
                 # Esperar a que los elementos de vuelo se carguen
-                vuelos = wait_for_elements(driver, 'div.journey_inner.target-conections-reviewer', timeout=wait_time)
+                with metrics.stage('avianca', 'wait_flights'):
+                    vuelos = wait_for_elements(driver, FLIGHT_SELECTOR, timeout=wait_time)
                 if not vuelos:
                     if attempt < MAX_RETRIES - 1:
-                        logging.warning('No se encontraron elementos de vuelo, reintentando con una nueva sesión...')
-                        if driver:
-                            driver.quit()
+                        logging.warning('No se encontraron elementos de vuelo, reintentando con una sesión limpia...')
+                        metrics.incr('avianca', 'retries')
+                        # Devolver el navegador al pool lo limpia sin relanzar Chrome
+                        pool.release(driver)
                         driver = None
-                        time.sleep(wait_time)
+                        with metrics.stage('avianca', 'backoff'):
+                            time.sleep(wait_time)
                         continue
                     else:
-                        logging.error('Se alcanzó el número máximo de reintentos, no se encontraron vuelos')
-                        break
+                        raise RuntimeError('Se alcanzó el número máximo de reintentos, no se encontraron vuelos')
+
+                html = driver.page_source
+                metrics.incr('avianca', 'page_bytes', len(html))
+                if recording():
+                    record_page('avianca', url, html)
 
                 # Extraer la información de los vuelos
                 logging.info('Vuelos encontrados:')
-                for vuelo in vuelos:
-                    info = extract_flight_info(vuelo)
-                    if info:
-                        logging.info(f'Detalles del vuelo: {info}')
-                        print('-' * 40)
+                with metrics.stage('avianca', 'extract'):
+                    extraidos = extract_flights(driver, vuelos)
+                for info in extraidos:
+                    flights.append(info)
+                    logging.info(f'Detalles del vuelo: {info}')
+                    print('-' * 40)
 
                 break  # Si todo salió bien, salir del bucle de reintentos
 
             except (TimeoutException, WebDriverException) as e:
                 if attempt < MAX_RETRIES - 1:
                     logging.warning(f'Error en el intento {attempt + 1}: {str(e)}')
+                    metrics.incr('avianca', 'retries')
                     if driver:
-                        driver.quit()
+                        # El pool descarta el navegador si ya no responde
+                        pool.release(driver)
                     driver = None
-                    time.sleep(wait_time)
+                    with metrics.stage('avianca', 'backoff'):
+                        time.sleep(wait_time)
                 else:
                     logging.error(f'Se alcanzó el número máximo de reintentos: {str(e)}')
                     raise
 
     except Exception as e:
+        # El error se propaga para que el planificador y la cola de trabajos lo reintenten
         logging.error(f'Error durante el scraping: {e}')
+        metrics.error('avianca', 'scrape')
+        raise
     finally:
         if driver:
-            driver.quit()
+            pool.release(driver)
+
+    metrics.incr('avianca', 'records', len(flights))
+    yield from flights
 
 if __name__ == '__main__':
-    # URL proporcionada directamente (sin automatizar la construcción)
-    url = "https://www.avianca.com/es/booking/select/?origin1=BOG&destination1=BGA&departure1=2025-04-14&adt1=2&tng1=2&chd1=2&inf1=2&origin2=BGA&destination2=BOG&departure2=2025-04-20&adt2=2&tng2=2&chd2=2&inf2=2&currency=COP&posCode=CO"
+    # Búsqueda de ejemplo; respeta AVIANCA_BASE_URL (servidor de réplica o staging)
+    url = build_url('BOG', 'BGA', '2025-04-14', adults=2)
 
-    # Ejecutar búsqueda de vuelos
-    scrape_flights(url)
+    # Ejecutar búsqueda de vuelos (con --profile se perfila la ejecución)
+    with profiling.from_argv('avianca'):
+        scrape_flights(url)
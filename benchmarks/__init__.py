@@ -0,0 +1,3 @@
+"""
+Benchmarks de los parsers de los scrapers (se ejecutan con `python -m benchmarks.<nombre>`).
+"""
@@ -0,0 +1,124 @@
+"""
+Compara los backends de inferencia de BaseBERTExtractor en CPU: PyTorch fp32
+(el camino actual), PyTorch con cuantización dinámica int8 y ONNX Runtime.
+
+Uso:
+    python -m benchmarks.bert_backends [--backend int8 --backend onnx] [--texts 256] [--json resultado.json]
+
+Para cada backend reporta tiempo de carga, tamaño de los pesos, latencia por
+texto, textos/segundo con la API por lotes y la paridad con fp32 (similitud
+coseno de los embeddings promediados por texto).
+
+Cada backend corre en su propio proceso, así la memoria reportada es la de ese
+backend solo (sin los pesos fp32 ni los demás modelos cargados). Para onnx la
+exportación se hace antes en otro proceso y no cuenta en carga ni memoria.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import statistics
+import time
+
+import torch
+
+from benchmarks.chatbot_latency import MENSAJES, percentile
+from bert_models import BACKENDS, BATCH_SIZE, MODEL_NAME, REGISTRY, BaseBERTExtractor
+
+
+def sample_texts(count):
+    """Textos de prueba de longitudes variadas a partir de los mensajes del chatbot"""
+    base = [message for _, _, message in MENSAJES]
+    return [' '.join(base[(i + j) % len(base)] for j in range(i % 4 + 1)) for i in range(count)]
+
+
+def pooled(embeddings):
+    """Promedio sobre los tokens de cada texto (los tensores ya vienen sin relleno)"""
+    return torch.stack([vectors[0].mean(dim=0) for vectors in embeddings])
+
+
+def bench_backend(extractor, texts, batch_size, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for text in texts:
+            started = time.perf_counter()
+            extractor.extract_entities(text)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        embeddings = extractor.extract_entities_batch(texts, batch_size)
+    batch_seconds = time.perf_counter() - started
+    return embeddings, {
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'batch_texts_per_second': round(len(texts) * repeat / batch_seconds, 1),
+    }
+
+
+def export_onnx(model_name):
+    """Exportar el modelo a ONNX (si no está ya exportado) sin medir nada"""
+    BaseBERTExtractor(model_name=model_name, use_bert=True, backend='onnx').extract_entities('exportar')
+
+
+def run_backend(backend, model_name, texts, batch_size, repeat):
+    """Se ejecuta en un proceso nuevo: carga, mide y devuelve los embeddings promediados y las estadísticas"""
+    extractor = BaseBERTExtractor(model_name=model_name, use_bert=True, backend=backend)
+    extractor.extract_entities(texts[0])  # Carga el modelo fuera de las mediciones
+    embeddings, stats = bench_backend(extractor, texts, batch_size, repeat)
+    load = REGISTRY.report()[model_name if backend == 'torch' else f'{model_name} [{backend}]']
+    stats.update({key: load[key] for key in ('load_seconds', 'model_mb', 'memory_mb')})
+    return pooled(embeddings).numpy(), stats
+
+
+def in_subprocess(function, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(function, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia y paridad de los backends de BERT en CPU')
+    parser.add_argument('--backend', action='append', choices=BACKENDS,
+                        help='Backends a comparar con torch (por defecto int8 y onnx)')
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--texts', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts)
+    backends = ['torch'] + [backend for backend in args.backend or ['int8', 'onnx'] if backend != 'torch']
+    results = {}
+    reference = None
+    for backend in backends:
+        if backend == 'onnx':
+            in_subprocess(export_onnx, args.model)
+        vectors, stats = in_subprocess(run_backend, backend, args.model, texts, args.batch_size, args.repeat)
+
+        vectors = torch.from_numpy(vectors)
+        if reference is None:
+            reference = vectors
+        similarity = torch.nn.functional.cosine_similarity(reference, vectors)
+        stats.update({
+            'cosine_mean': round(similarity.mean().item(), 5),
+            'cosine_min': round(similarity.min().item(), 5),
+        })
+        results[backend] = stats
+
+    torch_stats = results['torch']
+    for backend, stats in results.items():
+        stats['speedup'] = round(torch_stats['mean_ms'] / max(stats['mean_ms'], 1e-6), 2)
+        stats['batch_speedup'] = round(stats['batch_texts_per_second'] / torch_stats['batch_texts_per_second'], 2)
+        print(f"{backend:>5}: {stats['mean_ms']} ms/texto (p95 {stats['p95_ms']} ms, {stats['speedup']}x), "
+              f"{stats['batch_texts_per_second']} textos/s en lotes ({stats['batch_speedup']}x), "
+              f"pesos {stats['model_mb']} MB, memoria {stats['memory_mb']} MB, "
+              f"coseno medio {stats['cosine_mean']} (mín {stats['cosine_min']})")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
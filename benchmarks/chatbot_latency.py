@@ -0,0 +1,106 @@
+"""
+Latencia por mensaje de los extractores del chatbot: solo regex (lo que el
+chatbot hace por defecto), regex + embeddings de DistilBERT sin caché (lo que
+antes se pagaba en cada mensaje) y con la caché de embeddings ya caliente.
+
+Uso:
+    python -m benchmarks.chatbot_latency [--repeat 20] [--json resultado.json]
+
+La carga del modelo se mide aparte (registro compartido de bert_models) y no
+entra en la latencia por mensaje.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from bert_models import REGISTRY
+from chatbot import TravelChatbot
+from embedding_cache import EmbeddingCache
+
+# (extractor, método, mensaje de ejemplo)
+MENSAJES = [
+    ('avianca_extractor', 'extract_flight_info', 'vuelo directo bogotá medellín 10:45 am a 12:00 pm $200.000 cop'),
+    ('air_extractor', 'extract_accommodation_info',
+     'hotel bucaramanga plaza\ndescripción: centro, wifi gratis $180.000 cop por noche 4.5 estrellas'),
+    ('coopetran_extractor', 'extract_bus_info',
+     'bus coopetran 11:30 PM a 06:30 AM Terminal de Bogota 12 sillas disponibles'),
+    ('omega_extractor', 'extract_bus_info', 'bus omega ejecutivo 01:30 AM Terminal de Bucaramanga 8 asientos disponibles'),
+]
+
+
+def percentile(samples, fraction):
+    """Percentil por rango más cercano"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def time_mode(chatbot, embeddings, repeat):
+    """Latencias (s) de todos los mensajes de ejemplo, `repeat` veces"""
+    latencies = []
+    for _ in range(repeat):
+        for extractor, method, message in MENSAJES:
+            extract = getattr(getattr(chatbot, extractor), method)
+            started = time.perf_counter()
+            extract(message, embeddings=embeddings)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def set_cache(chatbot, cache):
+    for extractor, _, _ in MENSAJES:
+        getattr(chatbot, extractor).cache = cache
+
+
+def describe(latencies):
+    return {
+        'messages': len(latencies),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia del chatbot con y sin embeddings de BERT')
+    parser.add_argument('--repeat', type=int, default=20, help='Repeticiones de los mensajes de ejemplo')
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    args = parser.parse_args()
+
+    chatbot = TravelChatbot()
+    set_cache(chatbot, None)
+    # Calentamiento: carga el modelo compartido para que no cuente en la latencia por mensaje
+    time_mode(chatbot, embeddings=True, repeat=1)
+
+    results = {
+        'regex': describe(time_mode(chatbot, embeddings=False, repeat=args.repeat)),
+        'bert': describe(time_mode(chatbot, embeddings=True, repeat=args.repeat)),
+    }
+    # Caché solo en memoria, calentada con una pasada: cada mensaje repetido es una búsqueda
+    cache = EmbeddingCache(directory=None)
+    set_cache(chatbot, cache)
+    time_mode(chatbot, embeddings=True, repeat=1)
+    results['bert_cache'] = describe(time_mode(chatbot, embeddings=True, repeat=args.repeat))
+    results['cache'] = cache.stats()
+    results['model'] = REGISTRY.report()
+    results['speedup'] = round(results['bert']['mean_ms'] / max(results['regex']['mean_ms'], 1e-6), 1)
+    results['cache_speedup'] = round(results['bert']['mean_ms'] / max(results['bert_cache']['mean_ms'], 1e-6), 1)
+
+    for mode in ('regex', 'bert', 'bert_cache'):
+        stats = results[mode]
+        print(f"{mode:>10}: media {stats['mean_ms']} ms, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms "
+              f"({stats['messages']} mensajes)")
+    print(f"Solo regex es {results['speedup']}x más rápido por mensaje; "
+          f"con la caché caliente los embeddings son {results['cache_speedup']}x más rápidos")
+    print(f"Caché: {results['cache']}")
+    resumen = REGISTRY.summary()
+    if resumen:
+        print(resumen)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Throughput del extractor de campos de Copetran: una pasada (extraer_viaje)
+frente a una búsqueda por campo (extraer_viaje_por_campos).
+
+Uso:
+    python -m benchmarks.coopetran_extractor textos.txt [otros.txt ...]
+    python -m benchmarks.coopetran_extractor --synthetic 5000
+
+Cada archivo del corpus tiene el texto de un contenedor por línea.
+"""
+import argparse
+import time
+
+import coopetran
+
+TEXTO = (
+    "Salida {salida} Terminal de {origen} {horas}h Llegada Aprox {llegada} Terminal {destino} "
+    "$ {precio:,} COP {sillas} sillas disponibles Tipo de bus - {tipo} Ver sillas"
+)
+# "(por asignar)" no empieza por una palabra: cubre el caso en que el tipo de bus queda "No disponible"
+TIPOS = ["Platinum Plus", "Dos Pisos", "Preferencial", "Ejecutivo", "(por asignar)"]
+
+
+def synthetic_corpus(count):
+    """Textos de contenedor con el formato que deja extraer_texto_limpio"""
+    corpus = []
+    for i in range(count):
+        salida = i % 24
+        llegada = (salida + 9) % 24
+        corpus.append(TEXTO.format(
+            salida=f"{salida % 12 + 1:02d}:{i % 60:02d} {'AM' if salida < 12 else 'PM'}",
+            llegada=f"{llegada % 12 + 1:02d}:{(i * 7) % 60:02d} {'AM' if llegada < 12 else 'PM'}",
+            origen="Bogota", destino="Bucaramanga", horas=9,
+            precio=(90000 + i * 500) % 200000, sillas=i % 40, tipo=TIPOS[i % len(TIPOS)],
+        ))
+    return corpus
+
+
+def throughput(extractor, corpus, repeat):
+    """Mejor ritmo (contenedores/s) de `repeat` pasadas sobre el corpus"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for texto in corpus:
+            extractor(texto)
+        best = min(best, time.perf_counter() - started)
+    return len(corpus) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del extractor de Copetran')
+    parser.add_argument('corpus', nargs='*', help='Archivos con un texto de contenedor por línea')
+    parser.add_argument('--synthetic', type=int, default=0, help='Generar N textos sintéticos')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = []
+    for path in args.corpus:
+        with open(path, encoding='utf-8') as f:
+            corpus.extend(coopetran.extraer_texto_limpio(line) for line in f if line.strip())
+    if args.synthetic or not corpus:
+        corpus.extend(synthetic_corpus(args.synthetic or 5000))
+
+    diferencias = 0
+    for texto in corpus:
+        viaje = coopetran.extraer_viaje(texto)
+        viaje.pop('duracion_minutos')
+        diferencias += viaje != coopetran.extraer_viaje_por_campos(texto)
+
+    original = throughput(coopetran.extraer_viaje_por_campos, corpus, args.repeat)
+    una_pasada = throughput(coopetran.extraer_viaje, corpus, args.repeat)
+    print(f'{len(corpus)} contenedores, {diferencias} con resultados distintos')
+    print(f'  Por campo:  {original:,.0f} contenedores/s')
+    print(f'  Una pasada: {una_pasada:,.0f} contenedores/s ({una_pasada / original:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Compara el parser original de Omega (BeautifulSoup) con el parser rápido (lxml).
+
+Uso:
+    python -m benchmarks.omega_parser paginas/*.html
+    python -m benchmarks.omega_parser --synthetic 300
+
+Con páginas guardadas verifica además que ambos parsers devuelven lo mismo.
+"""
+import argparse
+import statistics
+import time
+
+import omega
+
+CONTENEDOR = """
+<div class="{contenedor}">
+  <div class="row">
+    <div class="{horario}">
+      <div>{salida}</div><svg title="{periodo_salida}"></svg>
+      <div class="{terminal}">Term. BUCARAMANGA</div>
+    </div>
+    <div class="{tipo}">Bus Dos Pisos {i}</div>
+    <div class="{horario}">
+      <div>{llegada}</div><svg title="{periodo_llegada}"></svg>
+      <div class="{terminal}">Term. BOGOTA SALITRE</div>
+    </div>
+    <div class="{asientos}">{sillas} sillas</div>
+    <div class="{precio}">$ {valor:,}</div>
+  </div>
+</div>
+"""
+
+
+def synthetic_page(containers):
+    """Página con `containers` resultados usando el marcado de Omega"""
+    results = [
+        CONTENEDOR.format(
+            i=i,
+            contenedor=omega.CLASE_CONTENEDOR,
+            horario=omega.CLASE_HORARIO,
+            terminal=omega.CLASE_TERMINAL,
+            tipo=omega.CLASE_TIPO_SERVICIO,
+            asientos=omega.CLASE_ASIENTOS,
+            precio=omega.CLASE_PRECIO,
+            salida=f"{i % 12 + 1:02d}:30",
+            llegada=f"{(i + 9) % 12 + 1:02d}:40",
+            periodo_salida="Noche" if i % 2 else "Mañana",
+            periodo_llegada="Madrugada" if i % 2 else "Tarde",
+            sillas=i % 40,
+            valor=80000 + i * 1000,
+        )
+        for i in range(containers)
+    ]
+    # Relleno típico de la página (menús, scripts) que el parser rápido no recorre
+    padding = "<div class='nav'><ul>" + "<li><a href='#'>enlace</a></li>" * 500 + "</ul></div>"
+    return f"<html><head><script>var x = 1;</script></head><body>{padding}{''.join(results)}</body></html>"
+
+
+def time_parser(parser, html, repeat):
+    """Tiempos (s) de `repeat` ejecuciones de `parser` sobre `html`"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parser(html)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de los parsers de Omega')
+    parser.add_argument('pages', nargs='*', help='Páginas de resultados guardadas (.html)')
+    parser.add_argument('--synthetic', type=int, default=0, help='Generar una página con N resultados')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, encoding='utf-8') as f:
+            pages.append((path, f.read()))
+    if args.synthetic or not pages:
+        pages.append((f'sintética ({args.synthetic or 200} resultados)', synthetic_page(args.synthetic or 200)))
+
+    for name, html in pages:
+        original = omega.parsear_viajes_bs4(html)
+        rapido = omega.parsear_viajes_lxml(html)
+        parity = 'iguales' if original == rapido else 'DIFERENTES'
+
+        bs4_times = time_parser(omega.parsear_viajes_bs4, html, args.repeat)
+        lxml_times = time_parser(omega.parsear_viajes_lxml, html, args.repeat)
+        bs4_median = statistics.median(bs4_times)
+        lxml_median = statistics.median(lxml_times)
+
+        print(f'{name}: {len(rapido)} viajes, resultados {parity}')
+        print(f'  BeautifulSoup: {bs4_median * 1000:.1f} ms (mediana de {args.repeat})')
+        print(f'  lxml:          {lxml_median * 1000:.1f} ms ({bs4_median / lxml_median:.1f}x más rápido)')
+
+
+if __name__ == '__main__':
+    main()
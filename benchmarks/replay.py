@@ -0,0 +1,108 @@
+"""
+Benchmark offline de los parsers sobre el corpus de fixtures grabado.
+
+Graba primero las páginas ejecutando los scrapers con RECORD_FIXTURES=fixtures
+y luego:
+    python -m benchmarks.replay [--fixtures fixtures] [--provider omega] [--json resultado.json] [--profile]
+
+Para cada proveedor reporta registros/segundo, latencia por página y por registro,
+y memoria pico (asignaciones de Python medidas con tracemalloc; no incluye
+la memoria interna de lxml). Con --profile se hace una pasada extra por
+proveedor bajo el perfilador (ver profiling.py).
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+import air
+import avianca
+import coopetran
+import omega
+import profiling
+from fixtures import DEFAULT_DIR, load_fixtures
+
+# Proveedor -> mitad de parseo del scraper (recibe el page_source, devuelve los registros)
+PARSERS = {
+    'airbnb': air.parsear_alojamientos_html,
+    'avianca': avianca.parse_flights_html,
+    'coopetran': coopetran.parsear_viajes,
+    'omega': omega.parsear_viajes,
+}
+
+
+def percentile(samples, fraction):
+    """Percentil por rango más cercano"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def bench_provider(parser, fixtures, repeat):
+    """Medir un parser sobre las fixtures; la memoria se mide en una pasada aparte"""
+    latencies = []
+    records = 0
+    for _ in range(repeat):
+        for fixture in fixtures:
+            started = time.perf_counter()
+            result = parser(fixture.html)
+            latencies.append(time.perf_counter() - started)
+            records += len(result)
+
+    tracemalloc.start()
+    for fixture in fixtures:
+        parser(fixture.html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        'fixtures': len(fixtures),
+        'records_per_page': records / len(latencies),
+        'records_per_second': records / total if total else 0.0,
+        'latency_ms_median': statistics.median(latencies) * 1000,
+        'latency_ms_p95': percentile(latencies, 0.95) * 1000,
+        'record_latency_ms': total * 1000 / records if records else None,
+        'peak_memory_mb': peak / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de parsers sobre fixtures grabadas')
+    parser.add_argument('--fixtures', default=DEFAULT_DIR, help='Directorio del corpus')
+    parser.add_argument('--provider', action='append', choices=sorted(PARSERS),
+                        help='Proveedor a medir (por defecto todos)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    parser.add_argument('--profile', action='store_true', help='Perfilar una pasada del parser de cada proveedor')
+    args = parser.parse_args()
+
+    results = {}
+    for provider in args.provider or sorted(PARSERS):
+        fixtures = load_fixtures(provider, args.fixtures)
+        if not fixtures:
+            print(f'{provider}: sin fixtures en {args.fixtures}/{provider}')
+            continue
+        stats = results[provider] = bench_provider(PARSERS[provider], fixtures, args.repeat)
+        record_latency = stats['record_latency_ms']
+        print(
+            f"{provider}: {stats['fixtures']} páginas, {stats['records_per_page']:.0f} registros/página, "
+            f"{stats['records_per_second']:,.0f} registros/s, "
+            f"página {stats['latency_ms_median']:.1f} ms (p95 {stats['latency_ms_p95']:.1f} ms), "
+            f"registro {'-' if record_latency is None else f'{record_latency:.3f}'} ms, "
+            f"memoria pico {stats['peak_memory_mb']:.1f} MB"
+        )
+        if args.profile:
+            # Pasada aparte para no inflar las latencias medidas arriba
+            with profiling.profiled(f'replay-{provider}'):
+                for _ in range(args.repeat):
+                    for fixture in fixtures:
+                        PARSERS[provider](fixture.html)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,224 @@
 import torch
-from transformers import DistilBertTokenizer, DistilBertModel
-from typing import Dict, List, Optional
+from transformers import DistilBertTokenizerFast, DistilBertModel
+from typing import Callable, Dict, List, Optional
+import gc
+import io
+import os
 import re
+import threading
+import time
+
+from embedding_cache import CACHE, EmbeddingCache
+
+try:
+    import psutil
+except ImportError:  # Optional: without psutil only the parameter size is reported
+    psutil = None
+
+try:
+    import onnxruntime
+except ImportError:  # Optional: only needed for the 'onnx' backend
+    onnxruntime = None
+
+MODEL_NAME = 'distilbert-base-multilingual-cased'
+# CHATBOT_BERT=0 runs the extractors regex-only: the model is never loaded and no embeddings are computed
+USE_BERT = os.environ.get('CHATBOT_BERT', '1') != '0'
+BATCH_SIZE = 64  # Texts per forward pass in the batch APIs
+# Inference backend: 'torch' (fp32), 'int8' (dynamic quantization of the Linear layers) or 'onnx' (ONNX Runtime)
+BACKEND = os.environ.get('BERT_BACKEND', 'torch')
+BACKENDS = ('torch', 'int8', 'onnx')
+ONNX_DIR = os.environ.get('ONNX_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'wayra', 'onnx'))
+ORT_THREADS = int(os.environ.get('ORT_THREADS', '0'))  # 0 lets ONNX Runtime use one thread per physical core
+
+def _rss_mb() -> Optional[float]:
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+class _Output:
+    def __init__(self, last_hidden_state: torch.Tensor):
+        self.last_hidden_state = last_hidden_state
+
+class OnnxModel:
+    """DistilBERT exported to ONNX and run with ONNX Runtime, callable like the PyTorch model."""
+
+    device = torch.device('cpu')
+
+    def __init__(self, path: str, threads: int = ORT_THREADS):
+        if onnxruntime is None:
+            raise ImportError("The 'onnx' backend requires onnxruntime (pip install onnxruntime)")
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    @staticmethod
+    def path_for(model_name: str, directory: str = ONNX_DIR) -> str:
+        return os.path.join(directory, re.sub(r'[^\w.-]', '_', model_name.strip('/')) + '.onnx')
+
+    @classmethod
+    def from_torch(cls, model, model_name: str, directory: str = ONNX_DIR) -> 'OnnxModel':
+        """Export `model` once (cached in `directory`) and open it with ONNX Runtime."""
+        path = cls.path_for(model_name, directory)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            temporary = f'{path}.{os.getpid()}.tmp'
+            example = torch.ones(1, 8, dtype=torch.long)
+            torch.onnx.export(
+                model.cpu(), (example, torch.ones_like(example)), temporary,
+                input_names=['input_ids', 'attention_mask'], output_names=['last_hidden_state'],
+                dynamic_axes={name: {0: 'batch', 1: 'sequence'}
+                              for name in ('input_ids', 'attention_mask', 'last_hidden_state')},
+                opset_version=17, dynamo=False,
+            )
+            os.replace(temporary, path)
+        return cls(path)
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor, **_) -> _Output:
+        hidden, = self.session.run(None, {
+            'input_ids': input_ids.cpu().numpy().astype('int64'),
+            'attention_mask': attention_mask.cpu().numpy().astype('int64'),
+        })
+        return _Output(torch.from_numpy(hidden))
+
+    def eval(self) -> 'OnnxModel':
+        return self
+
+def _model_mb(model) -> float:
+    """Size of the weights as stored (int8 packed weights included; the .onnx file for ONNX)."""
+    if isinstance(model, OnnxModel):
+        return os.path.getsize(model.path) / (1024 * 1024)
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+class ModelRegistry:
+    """Process-wide cache of (tokenizer, model) pairs: each model is loaded once and shared by all extractors."""
 
-class BaseBERTExtractor:
     def __init__(self):
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str = MODEL_NAME, backend: str = BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown BERT backend: {backend} (expected one of {', '.join(BACKENDS)})")
+        key = (model_name, backend)
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self._load(model_name, backend)
+            self._stats[key]['requests'] += 1
+            return self._models[key]
+
+    def _load(self, model_name: str, backend: str):
+        started = time.perf_counter()
+        rss_before = _rss_mb()
+        if backend == 'onnx' and os.path.exists(OnnxModel.path_for(model_name)):
+            # Already exported: the fp32 weights are never loaded
+            tokenizer = DistilBertTokenizerFast.from_pretrained(model_name)
+            model = OnnxModel(OnnxModel.path_for(model_name))
+        else:
+            tokenizer, model = self._load_torch(model_name, backend)
+        # Steady state: the fp32 weights (and the exporter's garbage) are released before measuring
+        gc.collect()
+        rss_after = _rss_mb()
+        self._stats[(model_name, backend)] = {
+            'load_seconds': time.perf_counter() - started,
+            'param_mb': _model_mb(model),
+            'rss_mb': rss_after - rss_before if rss_before is not None else None,
+            'requests': 0,
+        }
+        return tokenizer, model
+
+    def _load_torch(self, model_name: str, backend: str):
         try:
-            model_name = 'distilbert-base-multilingual-cased'
-            self.tokenizer = DistilBertTokenizer.from_pretrained(model_name)
-            self.model = DistilBertModel.from_pretrained(model_name)
-            if torch.cuda.is_available():
-                self.model = self.model.cuda()
-            self.model.eval()
+            tokenizer = DistilBertTokenizerFast.from_pretrained(model_name)
+            model = DistilBertModel.from_pretrained(model_name)
+            if backend == 'torch' and torch.cuda.is_available():
+                model = model.cuda()
+            model.eval()
             torch.cuda.empty_cache()
         except Exception as e:
             print(f"Error initializing BERT model: {str(e)}")
             try:
                 # Fallback to CPU
-                self.model = DistilBertModel.from_pretrained(model_name)
-                self.model.eval()
+                tokenizer = DistilBertTokenizerFast.from_pretrained(model_name)
+                model = DistilBertModel.from_pretrained(model_name)
+                model.eval()
             except Exception as e2:
                 print(f"Fallback initialization failed: {str(e2)}")
                 raise RuntimeError(f"Failed to initialize BERT model: {str(e)}")
 
+        # The int8 and ONNX backends are CPU-only and start from the fp32 weights, dropped on return
+        if backend == 'int8':
+            model = torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend == 'onnx':
+            model = OnnxModel.from_torch(model, model_name)
+        return tokenizer, model
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Per model: one load and how much load time and memory the extra extractors did not spend."""
+        report = {}
+        with self._lock:
+            for (model_name, backend), stats in self._stats.items():
+                shared = stats['requests'] - 1
+                memory_mb = stats['rss_mb'] if stats['rss_mb'] is not None else stats['param_mb']
+                report[model_name if backend == 'torch' else f'{model_name} [{backend}]'] = {
+                    'extractors': stats['requests'],
+                    'load_seconds': round(stats['load_seconds'], 2),
+                    'model_mb': round(stats['param_mb'], 1),
+                    'memory_mb': round(memory_mb, 1),
+                    'saved_seconds': round(stats['load_seconds'] * shared, 2),
+                    'saved_mb': round(memory_mb * shared, 1),
+                }
+        return report
+
+    def summary(self) -> str:
+        return '; '.join(
+            f"{name}: loaded once in {stats['load_seconds']}s ({stats['memory_mb']} MB) for "
+            f"{stats['extractors']} extractors, saved {stats['saved_seconds']}s and {stats['saved_mb']} MB"
+            for name, stats in self.report().items()
+        )
+
+REGISTRY = ModelRegistry()
+
+class BaseBERTExtractor:
+    def __init__(self, model_name: str = MODEL_NAME, registry: Optional[ModelRegistry] = None,
+                 use_bert: Optional[bool] = None, backend: Optional[str] = None,
+                 cache: Optional[EmbeddingCache] = CACHE):
+        self.model_name = model_name
+        self.backend = backend or BACKEND
+        self.cache = cache  # None disables embedding caching
+        self.registry = registry or REGISTRY
+        self.use_bert = USE_BERT if use_bert is None else use_bert
+        self._tokenizer = None
+        self._model = None
+
+    def _load_model(self):
+        # Tokenizer and weights come from the shared registry on first use; eval mode + no_grad make them safe to share
+        if self._model is None:
+            self._tokenizer, self._model = self.registry.get(self.model_name, self.backend)
+
+    @property
+    def tokenizer(self):
+        self._load_model()
+        return self._tokenizer
+
+    @property
+    def model(self):
+        self._load_model()
+        return self._model
+
     def preprocess_text(self, text: str) -> str:
         text = re.sub(r'\s+', ' ', text.strip())
         return text
 
-    def extract_entities(self, text: str) -> Dict[str, str]:
+    def extract_entities(self, text: str) -> Optional[torch.Tensor]:
+        """Token embeddings (last_hidden_state) for `text`, computed only on request; None in regex-only mode."""
+        if not self.use_bert:
+            return None
         text = self.preprocess_text(text)
         inputs = self.tokenizer(text, return_tensors='pt', padding=True, truncation=True)
         
@@ -36,14 +227,84 @@ class BaseBERTExtractor:
         
         return outputs.last_hidden_state
 
+    def extract_entities_batch(self, texts: List[str], batch_size: int = BATCH_SIZE) -> List[Optional[torch.Tensor]]:
+        """
+        Token embeddings for many texts, in input order (each shaped like `extract_entities`' output).
+        Texts are tokenized once with the fast tokenizer, sorted by length and padded per batch, so each
+        forward pass only pads up to the longest text of its own bucket.
+        """
+        if not self.use_bert:
+            return [None] * len(texts)
+        if not texts:
+            return []
+        encoded = self.tokenizer([self.preprocess_text(text) for text in texts], truncation=True)
+        order = sorted(range(len(texts)), key=lambda i: len(encoded['input_ids'][i]))
+        device = self.model.device
+        results: List[Optional[torch.Tensor]] = [None] * len(texts)
+
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                bucket = order[start:start + batch_size]
+                inputs = self.tokenizer.pad(
+                    {'input_ids': [encoded['input_ids'][i] for i in bucket],
+                     'attention_mask': [encoded['attention_mask'][i] for i in bucket]},
+                    return_tensors='pt',
+                )
+                hidden = self.model(**{key: value.to(device) for key, value in inputs.items()}).last_hidden_state
+                for row, index in enumerate(bucket):
+                    length = len(encoded['input_ids'][index])
+                    results[index] = hidden[row:row + 1, :length].cpu()
+        return results
+
+    @property
+    def model_id(self) -> str:
+        return f'{self.model_name}:{self.backend}'
+
+    def embed(self, text: str) -> Optional[torch.Tensor]:
+        """Mean-pooled embedding of `text`; repeated texts are served from the embedding cache."""
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: List[str], batch_size: int = BATCH_SIZE) -> List[Optional[torch.Tensor]]:
+        """Mean-pooled embeddings in input order; only texts missing from the cache reach the model."""
+        if not self.use_bert:
+            return [None] * len(texts)
+        normalized = [self.preprocess_text(text) for text in texts]
+        vectors = {}
+        if self.cache is not None:
+            for text in set(normalized):
+                cached = self.cache.get(self.model_id, text)
+                if cached is not None:
+                    vectors[text] = cached
+        missing = [text for text in dict.fromkeys(normalized) if text not in vectors]
+        if missing:
+            for text, hidden in zip(missing, self.extract_entities_batch(missing, batch_size)):
+                vectors[text] = hidden[0].mean(dim=0).float().numpy()
+                if self.cache is not None:
+                    self.cache.put(self.model_id, text, vectors[text])
+        return [torch.tensor(vectors[text]) for text in normalized]
+
+    def _extract_batch(self, extract: Callable[[str], Dict[str, str]], texts: List[str], embeddings: bool,
+                       batch_size: int) -> List[Dict[str, str]]:
+        infos = [extract(text) for text in texts]
+        if embeddings:
+            for info, vector in zip(infos, self.embed_batch(texts, batch_size)):
+                info['embeddings'] = vector
+        return infos
+
 class AviancaBERTExtractor(BaseBERTExtractor):
-    def extract_flight_info(self, text: str) -> Dict[str, str]:
-        entities = super().extract_entities(text)
-        return {
+    def extract_flight_info(self, text: str, embeddings: bool = False) -> Dict[str, str]:
+        info = {
             'schedule': self._extract_schedule(text),
             'price': self._extract_price(text),
             'flight_type': self._extract_flight_type(text)
         }
+        if embeddings:
+            info['embeddings'] = self.embed(text)
+        return info
+
+    def extract_flight_info_batch(self, texts: List[str], embeddings: bool = False,
+                                  batch_size: int = BATCH_SIZE) -> List[Dict[str, str]]:
+        return self._extract_batch(self.extract_flight_info, texts, embeddings, batch_size)
     
     def _extract_schedule(self, text: str) -> Dict[str, str]:
         schedule_pattern = r'(\d{1,2}:\d{2})\s*(?:AM|PM)?'
@@ -67,14 +328,20 @@ class AviancaBERTExtractor(BaseBERTExtractor):
         return ''
 
 class AirBERTExtractor(BaseBERTExtractor):
-    def extract_accommodation_info(self, text: str) -> Dict[str, str]:
-        entities = super().extract_entities(text)
-        return {
+    def extract_accommodation_info(self, text: str, embeddings: bool = False) -> Dict[str, str]:
+        info = {
             'title': self._extract_title(text),
             'description': self._extract_description(text),
             'price': self._extract_price(text),
             'rating': self._extract_rating(text)
         }
+        if embeddings:
+            info['embeddings'] = self.embed(text)
+        return info
+
+    def extract_accommodation_info_batch(self, texts: List[str], embeddings: bool = False,
+                                         batch_size: int = BATCH_SIZE) -> List[Dict[str, str]]:
+        return self._extract_batch(self.extract_accommodation_info, texts, embeddings, batch_size)
     
     def _extract_title(self, text: str) -> str:
         title_pattern = r'^([^\n]+)'
@@ -97,14 +364,20 @@ class AirBERTExtractor(BaseBERTExtractor):
         return match.group(1) if match else ''
 
 class CoopetranBERTExtractor(BaseBERTExtractor):
-    def extract_bus_info(self, text: str) -> Dict[str, str]:
-        entities = super().extract_entities(text)
-        return {
+    def extract_bus_info(self, text: str, embeddings: bool = False) -> Dict[str, str]:
+        info = {
             'schedule': self._extract_schedule(text),
             'terminal': self._extract_terminal(text),
             'seats': self._extract_seats(text),
             'bus_type': self._extract_bus_type(text)
         }
+        if embeddings:
+            info['embeddings'] = self.embed(text)
+        return info
+
+    def extract_bus_info_batch(self, texts: List[str], embeddings: bool = False,
+                               batch_size: int = BATCH_SIZE) -> List[Dict[str, str]]:
+        return self._extract_batch(self.extract_bus_info, texts, embeddings, batch_size)
     
     def _extract_schedule(self, text: str) -> Dict[str, str]:
         schedule_pattern = r'(\d{1,2}:\d{2})\s*(?:AM|PM)?'
@@ -138,14 +411,20 @@ class CoopetranBERTExtractor(BaseBERTExtractor):
         return match.group(1).strip() if match else ''
 
 class OmegaBERTExtractor(BaseBERTExtractor):
-    def extract_bus_info(self, text: str) -> Dict[str, str]:
-        entities = super().extract_entities(text)
-        return {
+    def extract_bus_info(self, text: str, embeddings: bool = False) -> Dict[str, str]:
+        info = {
             'schedule': self._extract_schedule(text),
             'terminal': self._extract_terminal(text),
             'service_type': self._extract_service_type(text),
             'seats': self._extract_seats(text)
         }
+        if embeddings:
+            info['embeddings'] = self.embed(text)
+        return info
+
+    def extract_bus_info_batch(self, texts: List[str], embeddings: bool = False,
+                               batch_size: int = BATCH_SIZE) -> List[Dict[str, str]]:
+        return self._extract_batch(self.extract_bus_info, texts, embeddings, batch_size)
     
     def _extract_schedule(self, text: str) -> Dict[str, str]:
         schedule_pattern = r'(\d{1,2}:\d{2})\s*(?:AM|PM)?'
@@ -1,6 +1,7 @@
 import torch
 from typing import Dict, List, Optional
-from bert_models import AviancaBERTExtractor, AirBERTExtractor, CoopetranBERTExtractor, OmegaBERTExtractor
+from bert_models import AviancaBERTExtractor, AirBERTExtractor, CoopetranBERTExtractor, OmegaBERTExtractor, REGISTRY
+import profiling
 
 class TravelChatbot:
     def __init__(self):
@@ -110,6 +111,9 @@ class TravelChatbot:
 # Example usage
 if __name__ == "__main__":
     chatbot = TravelChatbot()
+    if profiling.argv_flag():
+        # Se perfilan solo las respuestas (no la espera del input); el perfil se escribe al salir
+        chatbot.process_message = profiling.wrap(chatbot.process_message, "chatbot")
     print("¡Bienvenido al Chatbot de Viajes!")
     print("Escribe 'salir' para terminar la conversación.")
     
@@ -127,4 +131,9 @@ if __name__ == "__main__":
             break
         except Exception as e:
             print(f"\nOcurrió un error: {str(e)}")
-            print("Por favor, intenta de nuevo.")
\ No newline at end of file
+            print("Por favor, intenta de nuevo.")
+
+    # Un solo modelo en memoria para los cuatro extractores, cargado solo si algún mensaje pidió embeddings
+    resumen = REGISTRY.summary()
+    if resumen:
+        print(resumen)
\ No newline at end of file
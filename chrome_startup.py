@@ -0,0 +1,279 @@
+"""
+Arranque rápido de Chrome para los scrapers.
+
+- La ruta de chromedriver se resuelve una sola vez por proceso y se guarda en
+  disco (CHROMEDRIVER_CACHE), así que ni `ChromeDriverManager().install()` ni
+  Selenium Manager se vuelven a ejecutar en cada navegador nuevo. La caché
+  guarda la versión mayor de Chrome y se descarta cuando Chrome se actualiza.
+- Cada navegador arranca desde una copia de un perfil de usuario ya
+  inicializado (PROFILE_TEMPLATE_DIR) en lugar de hacer el primer arranque.
+- Se añaden banderas que evitan trabajo de fondo durante el arranque.
+
+Para comparar arranque en frío y en caliente:
+    python chrome_startup.py --runs 3
+"""
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+import argparse
+import atexit
+import copy
+import json
+import logging
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import weakref
+
+import metrics
+
+try:
+    from webdriver_manager.chrome import ChromeDriverManager
+except ImportError:  # Opcional: sin webdriver_manager se usa el chromedriver del PATH o Selenium Manager
+    ChromeDriverManager = None
+
+CACHE_FILE = os.environ.get(
+    'CHROMEDRIVER_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'wayra', 'chromedriver.json'))
+PROFILE_TEMPLATE_DIR = os.environ.get(
+    'PROFILE_TEMPLATE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'wayra', 'chrome-profile'))
+USE_PROFILE_TEMPLATE = os.environ.get('CHROME_PROFILE_TEMPLATE', '1') != '0'
+CHROME_BINARY = os.environ.get('CHROME_BINARY')
+CHROME_CANDIDATES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+
+# Banderas que evitan tareas de primer arranque y de red en segundo plano
+FAST_FLAGS = [
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-extensions',
+    '--disable-component-update',
+    '--disable-background-networking',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--metrics-recording-only',
+    '--password-store=basic',
+]
+
+# Contenido del perfil que no vale la pena copiar (cachés y bloqueos de la instancia anterior)
+TEMPLATE_IGNORE = shutil.ignore_patterns(
+    'Cache', 'Code Cache', 'GPUCache', 'GrShaderCache', 'ShaderCache', 'Crashpad', 'Singleton*', '*.lock')
+
+_lock = threading.Lock()
+_driver_path = None
+_profile_dirs = set()
+
+
+def chrome_major_version():
+    """Versión mayor de Chrome instalada (p. ej. 124), o None si no se puede determinar"""
+    if os.name == 'nt':
+        # En Windows `chrome --version` abre el navegador; la versión está en el registro
+        command = ['reg', 'query', r'HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon', '/v', 'version']
+    else:
+        binary = CHROME_BINARY or next(filter(None, map(shutil.which, CHROME_CANDIDATES)), None)
+        if binary is None:
+            return None
+        command = [binary, '--version']
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r'(\d+)\.\d+\.\d+', output)
+    return int(match.group(1)) if match else None
+
+
+def _read_cache():
+    try:
+        with open(CACHE_FILE, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    path = cache.get('path')
+    if not path or not os.access(path, os.X_OK):
+        return None
+    # Tras una actualización de Chrome el chromedriver guardado ya no sirve
+    major = chrome_major_version()
+    if major is not None and cache.get('chrome_major') != major:
+        logging.info(f'Chrome {major} no coincide con la caché de chromedriver (Chrome {cache.get("chrome_major")})')
+        return None
+    return path
+
+
+def _write_cache(path):
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        temporal = f'{CACHE_FILE}.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'path': path, 'chrome_major': chrome_major_version(), 'resolved_at': time.time()}, f)
+        os.replace(temporal, CACHE_FILE)
+    except OSError as e:
+        logging.warning(f'No se pudo guardar la ruta de chromedriver en caché: {e}')
+
+
+def chromedriver_path(refresh=False):
+    """
+    Ruta de chromedriver: CHROMEDRIVER_PATH, la caché en disco, el PATH o webdriver_manager,
+    en ese orden. Con `refresh` se ignora la caché y webdriver_manager va antes que el PATH,
+    porque descarga la versión que corresponde al Chrome instalado.
+    Devuelve None si solo Selenium Manager puede resolverlo.
+    """
+    global _driver_path
+    with _lock:
+        if _driver_path and not refresh:
+            return _driver_path
+
+        with metrics.stage('chrome', 'resolve_driver'):
+            path = os.environ.get('CHROMEDRIVER_PATH')
+            if not path and not refresh:
+                path = _read_cache()
+            if not path and refresh and ChromeDriverManager is not None:
+                path = ChromeDriverManager().install()
+            if not path:
+                path = shutil.which('chromedriver')
+            if not path and ChromeDriverManager is not None:
+                path = ChromeDriverManager().install()
+            if path:
+                _write_cache(path)
+        _driver_path = path
+        logging.info(f'chromedriver: {path or "resuelto por Selenium Manager"}')
+        return path
+
+
+def _service():
+    path = chromedriver_path()
+    return Service(executable_path=path) if path else Service()
+
+
+def build_profile_template(base_options=None, directory=None):
+    """Crear el perfil plantilla arrancando Chrome una vez; devuelve su ruta"""
+    directory = directory or PROFILE_TEMPLATE_DIR
+    if os.path.isdir(directory):
+        return directory
+
+    # Se construye al lado y se renombra, para que dos procesos no usen una plantilla a medias
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.template-', dir=parent)
+    options = copy.deepcopy(base_options) if base_options is not None else Options()
+    if base_options is None:
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+    for flag in FAST_FLAGS:
+        options.add_argument(flag)
+    options.add_argument(f'--user-data-dir={staging}')
+
+    with metrics.stage('chrome', 'build_template'):
+        driver = webdriver.Chrome(service=_service(), options=options)
+        try:
+            driver.get('about:blank')
+        finally:
+            driver.quit()
+
+    try:
+        os.rename(staging, directory)
+        logging.info(f'Perfil plantilla de Chrome creado en {directory}')
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)  # Otro proceso la creó primero
+    return directory
+
+
+def _copy_template(options):
+    template = build_profile_template(options)
+    destination = tempfile.mkdtemp(prefix='wayra-profile-')
+    shutil.copytree(template, destination, ignore=TEMPLATE_IGNORE, dirs_exist_ok=True)
+    _profile_dirs.add(destination)
+    return destination
+
+
+def _remove_profile(directory):
+    shutil.rmtree(directory, ignore_errors=True)
+    _profile_dirs.discard(directory)
+
+
+@atexit.register
+def _cleanup_profiles():
+    for directory in list(_profile_dirs):
+        _remove_profile(directory)
+
+
+def create_driver(options, use_template=None):
+    """Lanzar Chrome con `options`, el chromedriver en caché y una copia del perfil plantilla"""
+    use_template = USE_PROFILE_TEMPLATE if use_template is None else use_template
+    options = copy.deepcopy(options)
+    for flag in FAST_FLAGS:
+        if flag not in options.arguments:
+            options.add_argument(flag)
+
+    profile = None
+    if use_template and not any(arg.startswith('--user-data-dir') for arg in options.arguments):
+        try:
+            profile = _copy_template(options)
+            options.add_argument(f'--user-data-dir={profile}')
+        except Exception as e:
+            logging.warning(f'No se pudo usar el perfil plantilla, se arranca con uno nuevo: {e}')
+
+    try:
+        try:
+            driver = webdriver.Chrome(service=_service(), options=options)
+        except SessionNotCreatedException as e:
+            # Normalmente chromedriver de otra versión que Chrome: se resuelve de nuevo y se reintenta una vez
+            logging.warning(f'No se pudo crear la sesión de Chrome, se vuelve a resolver chromedriver: {e.msg}')
+            chromedriver_path(refresh=True)
+            driver = webdriver.Chrome(service=_service(), options=options)
+    except Exception:
+        if profile:
+            _remove_profile(profile)
+        raise
+    if profile:
+        # El perfil temporal se borra cuando el navegador se libera (o al salir del proceso)
+        weakref.finalize(driver, _remove_profile, profile)
+    return driver
+
+
+def compare_startup(options, runs=3):
+    """Tiempo medio de arranque en frío (resolución + perfil nuevo) y en caliente (caché + plantilla)"""
+    global _driver_path
+    results = {}
+    for mode in ('frio', 'caliente'):
+        samples = []
+        for _ in range(runs):
+            if mode == 'frio':
+                with _lock:
+                    _driver_path = None
+                started = time.perf_counter()
+                chromedriver_path(refresh=True)
+                driver = create_driver(options, use_template=False)
+            else:
+                build_profile_template(options)
+                started = time.perf_counter()
+                driver = create_driver(options, use_template=True)
+            elapsed = time.perf_counter() - started
+            driver.quit()
+            samples.append(elapsed)
+        results[mode] = {'mean_seconds': statistics.mean(samples), 'min_seconds': min(samples)}
+        logging.info(f'Arranque {mode}: {results[mode]}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar el arranque de Chrome en frío y en caliente')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    results = compare_startup(options, args.runs)
+    frio, caliente = results['frio']['mean_seconds'], results['caliente']['mean_seconds']
+    print(f'Arranque en frío: {frio:.2f}s, en caliente: {caliente:.2f}s ({frio / caliente:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Exportación columnar (Parquet) de viajes, vuelos y alojamientos.
+
+Los registros se normalizan con `records` y se guardan con columnas tipadas
+(precio en COP entero, horas en minutos desde la medianoche, asientos
+enteros), particionados al estilo Hive por proveedor y fecha:
+
+    <raíz>/proveedor=omega/fecha=2025-05-01/part-20250420T101500-1a2b3c4d.parquet
+
+Cada vaciado escribe archivos nuevos, así que añadir datos nunca reescribe
+los existentes. La lectura usa memory-map y filtra por partición:
+
+    tabla = read_table('datos', 'omega', desde='2025-05-01')
+    df = tabla.to_pandas()
+
+Requiere pyarrow (opcional para el resto del proyecto).
+"""
+from datetime import datetime
+import logging
+import os
+import uuid
+
+from records import normalizar
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional
+    pa = ds = pq = None
+
+BATCH_SIZE = 5000  # Registros por partición antes de escribir un archivo
+LISTING_PROVIDERS = ('airbnb',)
+
+
+def _schemas():
+    """Esquemas por tipo de registro (sin las columnas de partición proveedor y fecha)"""
+    trip = pa.schema([
+        ('origen', pa.string()),
+        ('destino', pa.string()),
+        ('salida_min', pa.int16()),
+        ('llegada_min', pa.int16()),
+        ('duracion_min', pa.int16()),
+        ('terminal_salida', pa.string()),
+        ('terminal_llegada', pa.string()),
+        ('servicio', pa.string()),
+        ('asientos', pa.int16()),
+        ('precio', pa.int32()),
+        ('tarifas', pa.map_(pa.string(), pa.int32())),
+        ('capturado', pa.timestamp('s')),
+    ])
+    listing = pa.schema([
+        ('id', pa.string()),
+        ('nombre', pa.string()),
+        ('ciudad', pa.string()),
+        ('precio', pa.int32()),
+        ('rating', pa.float32()),
+        ('url', pa.string()),
+        ('capturado', pa.timestamp('s')),
+    ])
+    return trip, listing
+
+
+class ParquetSink:
+    """
+    Acumula registros por (proveedor, fecha) y escribe un archivo Parquet nuevo por
+    partición al llenar el lote o al cerrar. Sirve como sink de `pipeline.Pipeline`.
+    `provider` se usa para los registros que no traen el campo 'proveedor'.
+    """
+
+    def __init__(self, root, provider=None, batch_size=BATCH_SIZE):
+        if pa is None:
+            raise ImportError('La exportación a Parquet requiere pyarrow (pip install pyarrow)')
+        self.root = root
+        self.provider = provider
+        self.batch_size = batch_size
+        self.stats = {'rows': 0, 'files': 0}
+        self._schemas = dict(zip(('trip', 'listing'), _schemas()))
+        self._buffers = {}
+
+    def write(self, record):
+        tipado = normalizar(record, self.provider)
+        provider = record.get('proveedor') or self.provider
+        schema = self._schemas['listing' if provider in LISTING_PROVIDERS else 'trip']
+        capturado = datetime.now().replace(microsecond=0)
+        row = {name: getattr(tipado, name, None) for name in schema.names}
+        row['capturado'] = capturado
+
+        key = (provider, str(getattr(tipado, 'fecha', None) or capturado.date().isoformat()))
+        rows = self._buffers.setdefault(key, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self._write_partition(key)
+
+    def flush(self):
+        """Escribir todas las particiones pendientes"""
+        for key in list(self._buffers):
+            self._write_partition(key)
+
+    def close(self):
+        self.flush()
+        logging.info(f'Parquet: {self.stats["rows"]} filas en {self.stats["files"]} archivos bajo {self.root}')
+        return self.stats
+
+    def _write_partition(self, key):
+        rows = self._buffers.pop(key, None)
+        if not rows:
+            return
+        provider, fecha = key
+        schema = self._schemas['listing' if provider in LISTING_PROVIDERS else 'trip']
+        table = pa.Table.from_pylist(rows, schema=schema)
+
+        directory = os.path.join(self.root, f'proveedor={provider}', f'fecha={fecha}')
+        os.makedirs(directory, exist_ok=True)
+        name = f'part-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet'
+        pq.write_table(table, os.path.join(directory, name), compression='zstd')
+        self.stats['rows'] += len(rows)
+        self.stats['files'] += 1
+
+
+def read_table(root, provider, desde=None, hasta=None, columns=None):
+    """
+    Leer las particiones de un proveedor con memory-map, opcionalmente entre dos
+    fechas (AAAA-MM-DD, inclusivas). Devuelve una pyarrow.Table con la columna 'fecha'.
+    """
+    if pa is None:
+        raise ImportError('La lectura de Parquet requiere pyarrow (pip install pyarrow)')
+    filters = []
+    if desde:
+        filters.append(('fecha', '>=', str(desde)))
+    if hasta:
+        filters.append(('fecha', '<=', str(hasta)))
+    # La fecha se declara como texto para que los filtros comparen cadenas ISO
+    partitioning = ds.partitioning(pa.schema([('fecha', pa.string())]), flavor='hive')
+    return pq.read_table(
+        os.path.join(root, f'proveedor={provider}'),
+        columns=columns,
+        filters=filters or None,
+        partitioning=partitioning,
+        memory_map=True,
+    )
+
@@ -1,17 +1,69 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import time
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+from chrome_startup import create_driver
+from driver_pool import get_pool
+from fixtures import record_page
+from http_fetch import selenium_done, try_http
+from resource_blocking import with_profile, install_blocking
+from readiness import install_network_tracker, wait_until_ready
+from records import cop, minutos
+from urllib.parse import urlencode
+import metrics
+import os
+import profiling
 import re
 
-def configurar_selenium():
+# Origen del sitio; COOPETRAN_BASE_URL permite apuntar al servidor de réplica local
+BASE_URL = os.environ.get("COOPETRAN_BASE_URL", "https://tiquetes.copetran.com")
+SEARCH_PATH = "/busqueda"
+
+# Ciudades conocidas: clave -> (origen_id/destino_id, nombre mostrado)
+CIUDADES = {
+    "bogota": (15, "Bogota, DC (Todas)"),
+    "bucaramanga": (34, "Bucaramanga, SAN (Todas)"),
+}
+
+def construir_url(origen, destino, fecha):
+    """
+    Construye la URL de búsqueda de Copetran para una ruta y fecha (AAAA-MM-DD)
+    """
+    if origen not in CIUDADES or destino not in CIUDADES:
+        raise ValueError(f"Ciudad desconocida para Copetran: {origen} -> {destino}")
+    origen_id, origen_nombre = CIUDADES[origen]
+    destino_id, destino_nombre = CIUDADES[destino]
+    params = {
+        "origen": origen_nombre,
+        "origen_id": origen_id,
+        "destino": destino_nombre,
+        "destino_id": destino_id,
+        "salida": fecha,
+    }
+    return f"{BASE_URL}{SEARCH_PATH}?{urlencode(params)}"
+
+# Selectores a probar, en orden, para los contenedores de viajes
+SELECTORES_CONTENEDOR = [
+    ".ticket-card-container",
+    ".travel-card",
+    "div[class*='ticket']",
+    "div[class*='travel']",
+    "div[class*='journey']"
+]
+
+# Un único patrón con todos los campos de un contenedor; el nombre del grupo indica el campo
+PATRON_VIAJE = re.compile(r"""
+    (?P<llegada>Llegada\ Aprox)
+  | (?P<horario>(?P<hora>\d{1,2}):(?P<minutos>\d{2})\s*(?P<periodo>AM|PM))
+  | (?P<precio>\$\s*[\d.,]+(?:\s*(?:COP|USD))?)
+  | (?P<sillas>\d+)\s*sillas\s*disponibles
+  | Terminal\s+(?:de\s+)?(?P<terminal>\w+)
+  | (?P<tipo_bus>Tipo\s+de\s+bus\s*-)
+""", re.VERBOSE)
+PATRON_NOMBRE_TIPO_BUS = re.compile(r"\s*([\w\s]+)")
+
+def configurar_selenium(bloquear_recursos=None):
     """
-    Configura el navegador Chrome para Selenium
+    Configura el navegador Chrome para Selenium (con el perfil de bloqueo de recursos salvo que se desactive)
     """
     options = Options()
     options.add_argument("--headless")
@@ -23,21 +75,17 @@ def configurar_selenium():
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
-    service = Service()
-    return webdriver.Chrome(service=service, options=options)
+    options = with_profile(options, "coopetran", bloquear_recursos)
+    # chromedriver ya resuelto y perfil plantilla: el arranque no repite la resolución
+    driver = create_driver(options)
+    install_blocking(driver, "coopetran", bloquear_recursos)
+    return driver
 
-def esperar_y_obtener_elementos(driver, selector, by=By.CSS_SELECTOR, timeout=20):
+def obtener_pool():
     """
-    Espera y obtiene elementos con manejo de errores
+    Devuelve el pool de navegadores compartido de Copetran
     """
-    try:
-        WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((by, selector))
-        )
-        return True
-    except TimeoutException:
-        print(f"Timeout esperando por elementos con selector: {selector}")
-        return False
+    return get_pool("coopetran", configurar_selenium)
 
 def extraer_texto_limpio(texto):
     """
@@ -134,90 +182,204 @@ def extraer_tipo_bus(texto):
     # Busca el tipo de bus después de "Tipo de bus -"
     tipo = re.search(r'Tipo\s+de\s+bus\s*-\s*([\w\s]+)', texto)
     if tipo:
-        return tipo.group(1).strip()
+        # Tras el guion puede no venir una palabra ("Tipo de bus - (por asignar)")
+        return tipo.group(1).strip() or "No disponible"
     return "No disponible"
 
+def extraer_viaje_por_campos(texto_completo):
+    """
+    Extracción original: una búsqueda por campo sobre el texto del contenedor (referencia para el benchmark)
+    """
+    return {
+        'horario_salida': extraer_horario(texto_completo),
+        'horario_llegada': extraer_horario(texto_completo.split('Llegada Aprox')[-1] if 'Llegada Aprox' in texto_completo else ''),
+        'terminal_salida': extraer_terminal(texto_completo),
+        'terminal_llegada': extraer_terminal(texto_completo.split('Llegada Aprox')[-1] if 'Llegada Aprox' in texto_completo else ''),
+        'duracion': calcular_duracion(extraer_horario(texto_completo),
+                  extraer_horario(texto_completo.split('Llegada Aprox')[-1] if 'Llegada Aprox' in texto_completo else '')),
+        'precio': extraer_precio(texto_completo),
+        'sillas_disponibles': extraer_sillas(texto_completo),
+        'tipo_bus': extraer_tipo_bus(texto_completo)
+    }
+
+def minutos_del_dia(hora, minutos, periodo):
+    """
+    Convierte una hora de 12 horas ("11", "30", "PM") en minutos desde la medianoche
+    """
+    hora = int(hora)
+    if not 1 <= hora <= 12:
+        return None
+    return (hora % 12 + (12 if periodo == "PM" else 0)) * 60 + int(minutos)
+
+def formatear_duracion(minutos):
+    """
+    Duración en minutos con el mismo formato que calcular_duracion
+    """
+    if minutos is None:
+        return "No disponible"
+    horas, minutos = divmod(minutos, 60)
+    if minutos == 0:
+        return f"{horas} horas"
+    return f"{horas} horas y {minutos} minutos"
+
+def extraer_viaje(texto_completo):
+    """
+    Extrae todos los campos de un viaje recorriendo el texto una sola vez.
+    Los campos de llegada son los que aparecen después del último "Llegada Aprox".
+    """
+    horario_salida = horario_llegada = terminal_salida = terminal_llegada = None
+    precio = sillas = tipo_bus = None
+    minutos_salida = minutos_llegada = None
+    tras_llegada = False
+
+    for coincidencia in PATRON_VIAJE.finditer(texto_completo):
+        campo = coincidencia.lastgroup
+        if campo == "llegada":
+            # Como split('Llegada Aprox')[-1]: cuenta solo lo posterior a la última marca
+            tras_llegada = True
+            horario_llegada = terminal_llegada = minutos_llegada = None
+        elif campo == "horario":
+            if horario_salida is None:
+                horario_salida = coincidencia.group("horario")
+                minutos_salida = minutos_del_dia(*coincidencia.group("hora", "minutos", "periodo"))
+            if tras_llegada and horario_llegada is None:
+                horario_llegada = coincidencia.group("horario")
+                minutos_llegada = minutos_del_dia(*coincidencia.group("hora", "minutos", "periodo"))
+        elif campo == "terminal":
+            nombre = f"Terminal de {coincidencia.group('terminal')}"
+            if terminal_salida is None:
+                terminal_salida = nombre
+            if tras_llegada and terminal_llegada is None:
+                terminal_llegada = nombre
+        elif campo == "precio" and precio is None:
+            precio = coincidencia.group("precio")
+        elif campo == "sillas" and sillas is None:
+            sillas = f"{coincidencia.group('sillas')} sillas disponibles"
+        elif campo == "tipo_bus" and tipo_bus is None:
+            nombre = PATRON_NOMBRE_TIPO_BUS.match(texto_completo, coincidencia.end())
+            if nombre:
+                tipo_bus = nombre.group(1).strip()
+
+    duracion_minutos = None
+    if minutos_salida is not None and minutos_llegada is not None:
+        # Si el viaje cruza la medianoche la resta negativa se corrige con el módulo
+        duracion_minutos = (minutos_llegada - minutos_salida) % (24 * 60)
+
+    return {
+        'horario_salida': horario_salida or "No disponible",
+        'horario_llegada': horario_llegada or "No disponible",
+        'terminal_salida': terminal_salida or "No disponible",
+        'terminal_llegada': terminal_llegada or "No disponible",
+        'duracion': formatear_duracion(duracion_minutos),
+        'duracion_minutos': duracion_minutos,
+        'precio': precio or "No disponible",
+        'sillas_disponibles': sillas or "No disponible",
+        'tipo_bus': tipo_bus or "No disponible"
+    }
+
+def parsear_viajes(html):
+    """
+    Extrae los viajes del HTML de resultados con BeautifulSoup
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Lista para almacenar todos los viajes
+    viajes = []
+
+    # Intentar encontrar los contenedores con diferentes selectores
+    contenedores = []
+    for selector in SELECTORES_CONTENEDOR:
+        contenedores = soup.select(selector)
+        if contenedores:
+            break
+
+    if not contenedores:
+        print("No se encontraron contenedores de viajes en la página")
+        return []
+
+    for contenedor in contenedores:
+        try:
+            texto_completo = extraer_texto_limpio(contenedor.get_text())
+
+            # Todos los campos en un solo recorrido del texto
+            viajes.append(extraer_viaje(texto_completo))
+        except Exception as e:
+            print(f"Error al procesar un contenedor de viaje: {str(e)}")
+            continue
+
+    return viajes
+
 def obtener_info_viajes(url):
     """
-    Obtiene la información de los viajes usando Selenium y BeautifulSoup
+    Obtiene la información de los viajes (por HTTP o con Selenium) y BeautifulSoup; lista vacía si falla
+    """
+    try:
+        return list(iterar_viajes(url))
+    except Exception:
+        return []
+
+def viaje_valido(viaje):
+    """
+    Un viaje real trae al menos la hora de salida o el precio (una página sin renderizar da filas vacías)
+    """
+    return minutos(viaje["horario_salida"]) is not None or cop(viaje["precio"]) is not None
+
+def iterar_viajes(url):
+    """
+    Generador de viajes: primero por HTTP y, si los resultados necesitan JavaScript, con Selenium
     """
-    driver = configurar_selenium()
+    viajes = try_http("coopetran", url, parsear_viajes, is_valid=viaje_valido)
+    if viajes is None:
+        encontrados = False
+        for viaje in iterar_viajes_selenium(url):
+            encontrados = True
+            yield viaje
+        selenium_done("coopetran", encontrados)
+        return
+    metrics.incr("coopetran", "records", len(viajes))
+    yield from viajes
+
+def iterar_viajes_selenium(url):
+    """
+    Generador de viajes con Selenium: el navegador vuelve al pool antes de entregar el primer registro
+    """
+    pool = obtener_pool()
+    driver = pool.acquire()
+    descartar = False
     try:
         print("Accediendo a la página...")
-        driver.get(url)
-        time.sleep(5)  # Espera inicial para carga de JavaScript
-
-        # Intentar diferentes selectores para los contenedores de viajes
-        selectors_to_try = [
-            ".ticket-card-container",
-            ".travel-card",
-            "div[class*='ticket']",
-            "div[class*='travel']",
-            "div[class*='journey']"
-        ]
-
-        found = False
-        for selector in selectors_to_try:
-            if esperar_y_obtener_elementos(driver, selector):
-                found = True
-                print(f"Elementos encontrados con selector: {selector}")
-                break
+        install_network_tracker(driver)
+        with metrics.stage("coopetran", "get"):
+            driver.get(url)
+
+        # Esperar a que cualquiera de los selectores tenga resultados estables
+        with metrics.stage("coopetran", "wait"):
+            found = wait_until_ready(driver, ", ".join(SELECTORES_CONTENEDOR), timeout=25, label="coopetran")
 
         if not found:
             print("No se pudieron encontrar los elementos de viajes")
-            return []
+            return
 
         # Obtener el HTML después de que JavaScript haya cargado todo el contenido
         html = driver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Lista para almacenar todos los viajes
-        viajes = []
-
-        # Intentar encontrar los contenedores con diferentes selectores
-        contenedores = []
-        for selector in selectors_to_try:
-            contenedores = soup.select(selector)
-            if contenedores:
-                break
-
-        if not contenedores:
-            print("No se encontraron contenedores de viajes en la página")
-            return []
-
-        for contenedor in contenedores:
-            try:
-                texto_completo = extraer_texto_limpio(contenedor.get_text())
-                
-                # Crear diccionario con la información extraída usando las funciones especializadas
-                viaje = {
-                    'horario_salida': extraer_horario(texto_completo),
-                    'horario_llegada': extraer_horario(texto_completo.split('Llegada Aprox')[-1] if 'Llegada Aprox' in texto_completo else ''),
-                    'terminal_salida': extraer_terminal(texto_completo),
-                    'terminal_llegada': extraer_terminal(texto_completo.split('Llegada Aprox')[-1] if 'Llegada Aprox' in texto_completo else ''),
-                    'duracion': calcular_duracion(extraer_horario(texto_completo), 
-                              extraer_horario(texto_completo.split('Llegada Aprox')[-1] if 'Llegada Aprox' in texto_completo else '')),
-                    'precio': extraer_precio(texto_completo),
-                    'sillas_disponibles': extraer_sillas(texto_completo),
-                    'tipo_bus': extraer_tipo_bus(texto_completo)
-                }
-                
-                viajes.append(viaje)
-            except Exception as e:
-                print(f"Error al procesar un contenedor de viaje: {str(e)}")
-                continue
-
-        return viajes
+        metrics.incr("coopetran", "page_bytes", len(html))
+        record_page("coopetran", url, html)
 
     except Exception as e:
+        # El error se propaga para que el planificador y la cola de trabajos lo reintenten
         print(f"Error durante la extracción de datos: {str(e)}")
-        return []
+        descartar = isinstance(e, WebDriverException)
+        raise
     finally:
-        driver.quit()
+        pool.release(driver, discard=descartar)
+
+    with metrics.stage("coopetran", "parse"):
+        viajes = parsear_viajes(html)
+    metrics.incr("coopetran", "records", len(viajes))
+    yield from viajes
 
 def main():
-    # URL exacta proporcionada por el usuario
-    url = "https://tiquetes.copetran.com/busqueda?origen=Bogota,+DC+(Todas)&origen_id=15&destino=Bucaramanga,+SAN+(Todas)&destino_id=34&salida=2025-04-12"
+    url = construir_url("bogota", "bucaramanga", "2025-04-12")
 
     print("Buscando viajes disponibles...")
     viajes = obtener_info_viajes(url)
@@ -225,12 +387,11 @@ def main():
     if viajes:
         print(f"\nSe encontraron {len(viajes)} viajes:")
         for i, viaje in enumerate(viajes, 1):
-            duracion = calcular_duracion(viaje['horario_salida'], viaje['horario_llegada'])
             print(f"\nViaje #{i}")
             print("=" * 50)
             print(f"Horario de salida: {viaje['horario_salida']}")
             print(f"Horario de llegada: {viaje['horario_llegada']}")
-            print(f"Duración aproximada: {duracion}")
+            print(f"Duración aproximada: {viaje['duracion']}")
             print(f"Terminal de salida: {viaje['terminal_salida']}")
             print(f"Terminal de llegada: {viaje['terminal_llegada']}")
             print(f"Precio: {viaje['precio']}")
@@ -240,4 +401,5 @@ def main():
         print("No se encontraron viajes disponibles")
 
 if __name__ == "__main__":
-    main()
+    with profiling.from_argv("coopetran"):
+        main()
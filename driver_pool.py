@@ -0,0 +1,193 @@
+"""
+Pool compartido de navegadores Chrome para los scrapers.
+
+Los scrapers piden prestado un navegador con `checkout()` en lugar de lanzar
+uno nuevo por cada URL. Al devolverlo se limpian cookies, storage y caché, y
+el navegador se recicla cuando supera el número máximo de páginas o el techo
+de memoria RSS configurado.
+"""
+from selenium.common.exceptions import WebDriverException
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import atexit
+import logging
+import threading
+
+import metrics
+
+try:
+    import psutil
+except ImportError:  # Opcional: sin psutil no se vigila la memoria RSS
+    psutil = None
+
+POOL_SIZE = 2  # Navegadores calientes por pool
+MAX_PAGES = 50  # Páginas servidas antes de reciclar el navegador
+MAX_RSS_MB = 1536  # Techo de memoria (Chrome + chromedriver) antes de reciclar
+
+
+def driver_rss_mb(driver):
+    """Memoria RSS en MB de chromedriver y todos sus procesos de Chrome"""
+    if psutil is None:
+        return None
+    try:
+        proceso = psutil.Process(driver.service.process.pid)
+        procesos = [proceso] + proceso.children(recursive=True)
+        return sum(p.memory_info().rss for p in procesos) / (1024 * 1024)
+    except (psutil.Error, AttributeError):
+        return None
+
+
+def reset_driver(driver):
+    """Dejar el navegador limpio (una pestaña, sin cookies, storage ni caché)"""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    actual = urlparse(driver.current_url)
+    if actual.scheme in ('http', 'https'):
+        driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+            'origin': f'{actual.scheme}://{actual.netloc}',
+            'storageTypes': 'all',
+        })
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+    driver.get('about:blank')
+
+
+class DriverPool:
+    """Pool de navegadores reutilizables creados con `factory`"""
+
+    def __init__(self, factory, size=POOL_SIZE, max_pages=MAX_PAGES, max_rss_mb=MAX_RSS_MB, name='driver'):
+        self.factory = factory
+        self.name = name  # Etiqueta de proveedor en las métricas
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._idle = []
+        self._pages = {}
+        self._live = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def warm_up(self, count=None):
+        """Lanzar navegadores por adelantado para que el primer trabajo no pague el arranque"""
+        drivers = [self.acquire() for _ in range(min(count or self.size, self.size))]
+        for driver in drivers:
+            self._put_back(driver)
+
+    def acquire(self, timeout=None):
+        """Obtener un navegador libre, creando uno nuevo si el pool no está lleno"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('El pool de navegadores está cerrado')
+                if self._idle:
+                    return self._idle.pop()
+                if self._live < self.size:
+                    self._live += 1
+                    break
+                if not self._cond.wait(timeout):
+                    raise TimeoutError('No hay navegadores libres en el pool')
+
+        try:
+            with metrics.stage(self.name, 'chrome_start'):
+                driver = self.factory()
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+        self._pages[id(driver)] = 0
+        return driver
+
+    def release(self, driver, discard=False):
+        """Devolver un navegador al pool (cada préstamo cuenta como una página servida)"""
+        pages = self._pages.get(id(driver), 0) + 1
+        self._pages[id(driver)] = pages
+
+        if not discard:
+            if pages >= self.max_pages:
+                logging.info(f'Reciclando navegador tras {pages} páginas')
+                discard = True
+            else:
+                rss = driver_rss_mb(driver)
+                if rss is not None and rss >= self.max_rss_mb:
+                    logging.info(f'Reciclando navegador por memoria ({rss:.0f} MB)')
+                    discard = True
+
+        if not discard:
+            try:
+                with metrics.stage(self.name, 'reset'):
+                    reset_driver(driver)
+            except WebDriverException as e:
+                logging.warning(f'No se pudo limpiar el navegador, se descarta: {e}')
+                discard = True
+
+        if discard:
+            self._discard(driver)
+        else:
+            self._put_back(driver)
+
+    @contextmanager
+    def checkout(self):
+        """Prestar un navegador; se descarta si el trabajo falla con un error de WebDriver"""
+        driver = self.acquire()
+        discard = False
+        try:
+            yield driver
+        except WebDriverException:
+            discard = True
+            raise
+        finally:
+            self.release(driver, discard=discard)
+
+    def close(self):
+        """Cerrar todos los navegadores libres; los prestados se cierran al devolverse"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._discard(driver)
+
+    def _put_back(self, driver):
+        with self._cond:
+            if not self._closed:
+                self._idle.append(driver)
+                self._cond.notify()
+                return
+        self._discard(driver)
+
+    def _discard(self, driver):
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f'Error al cerrar el navegador: {e}')
+        with self._cond:
+            self._live -= 1
+            self._cond.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, factory, **kwargs):
+    """Pool compartido del proveedor `name`; se crea en el primer uso"""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = DriverPool(factory, name=name, **kwargs)
+        return pool
+
+
+@atexit.register
+def close_all():
+    """Cerrar todos los pools al terminar el proceso"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
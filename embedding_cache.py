@@ -0,0 +1,225 @@
+"""
+Two-tier cache for pooled text embeddings.
+
+Keys are the BLAKE2 hash of the normalized text (the output of
+`preprocess_text`) within a model id (model name + backend), so the same
+string never goes through the model twice:
+
+- memory: bounded LRU of float32 vectors (MEMORY_SIZE entries)
+- disk: per model, a memory-mapped float16 matrix of DISK_SIZE rows used as a
+  ring buffer; the oldest row is overwritten once it is full
+
+Disk layout (EMBEDDING_CACHE_DIR/<model id>/): vectors.f16, keys.bin (16-byte
+digests, one per row), meta.json and lock. The first process to open a
+directory takes an exclusive lock on it and is its only writer; other
+processes (scheduler workers, forked children) map it read-only, or keep only
+the memory tier if the store does not exist yet. A row is trusted only if its
+stored key still matches, so rows the writer reuses read as misses.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CACHE_DIR = os.environ.get(
+    'EMBEDDING_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'wayra', 'embeddings'))
+MEMORY_SIZE = int(os.environ.get('EMBEDDING_CACHE_MEMORY', '10000'))
+DISK_SIZE = int(os.environ.get('EMBEDDING_CACHE_DISK', '50000'))  # ~77 MB of vectors at 768 dimensions
+META_EVERY = 1000  # Writes between meta.json updates (also written at exit)
+KEY_BYTES = 16
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=KEY_BYTES).digest()
+
+def _lock_directory(directory: str):
+    """Non-blocking exclusive lock on `directory`; the open lock file, or None if another process holds it."""
+    handle = open(os.path.join(directory, 'lock'), 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+class _DiskStore:
+    """Memory-mapped float16 ring buffer of embeddings for one model; writable only by the lock holder."""
+
+    def __init__(self, directory: str, dim: int, capacity: int):
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.pid = os.getpid()
+        self.lock = _lock_directory(directory)
+        self.writable = self.lock is not None
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        # An existing store keeps its shape; a different dimension means a different model, so start over
+        exists = meta.get('dim') == dim
+        if not exists and not self.writable:
+            raise FileNotFoundError(f'{directory} is locked by another process and has no store for dim {dim}')
+        self.dim = dim
+        self.capacity = meta['capacity'] if exists else capacity
+        self.next = meta.get('next', 0) if exists else 0
+        mode = ('r+' if exists else 'w+') if self.writable else 'r'
+        self.vectors = np.memmap(os.path.join(directory, 'vectors.f16'), dtype=np.float16, mode=mode,
+                                 shape=(self.capacity, dim))
+        self.keys = np.memmap(os.path.join(directory, 'keys.bin'), dtype=np.uint8, mode=mode,
+                              shape=(self.capacity, KEY_BYTES))
+        # Rows that were never written are all zeros
+        self.index = {self.keys[row].tobytes(): int(row) for row in np.flatnonzero(self.keys.any(axis=1))}
+        self.pending = 0
+        if not exists:
+            self.write_meta()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self.index.get(key)
+        if row is None:
+            return None
+        vector = np.array(self.vectors[row], dtype=np.float32)
+        # The key is checked after copying: a row the writer reused (or is rewriting) is a miss
+        if self.keys[row].tobytes() != key:
+            del self.index[key]
+            return None
+        return vector
+
+    def put(self, key: bytes, vector: np.ndarray) -> bool:
+        """Store `vector`; returns True if an older entry was evicted to make room."""
+        if not self.writable or key in self.index:
+            return False
+        row = self.next % self.capacity
+        evicted = self.index.pop(self.keys[row].tobytes(), None) is not None
+        # Clear the key first so readers never pair the old key with the new vector
+        self.keys[row] = 0
+        self.vectors[row] = vector.astype(np.float16)
+        self.keys[row] = np.frombuffer(key, dtype=np.uint8)
+        self.index[key] = row
+        self.next = row + 1
+        self.pending += 1
+        if self.pending >= META_EVERY:
+            self.flush()
+        return evicted
+
+    def write_meta(self):
+        temporary = f'{self.meta_path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'dim': self.dim, 'capacity': self.capacity, 'next': self.next}, f)
+        os.replace(temporary, self.meta_path)
+
+    def flush(self):
+        if not self.writable or self.pid != os.getpid():
+            return
+        self.vectors.flush()
+        self.keys.flush()
+        self.write_meta()
+        self.pending = 0
+
+class EmbeddingCache:
+    """Memory LRU in front of a memory-mapped float16 disk tier, with hit/miss/eviction counters."""
+
+    def __init__(self, directory: Optional[str] = CACHE_DIR, memory_size: int = MEMORY_SIZE,
+                 disk_size: int = DISK_SIZE):
+        self.directory = directory  # None keeps only the memory tier
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory = OrderedDict()
+        self._stores: Dict[str, Optional[_DiskStore]] = {}  # None: locked by another process, memory only
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                         'memory_evictions': 0, 'disk_evictions': 0}
+
+    def _store(self, model_id: str, dim: Optional[int] = None) -> Optional[_DiskStore]:
+        store = self._stores.get(model_id)
+        if store is not None and store.pid != os.getpid():
+            # Forked child: the parent owns the lock, so reopen (read-only unless the parent is gone)
+            store = None
+            del self._stores[model_id]
+        if model_id not in self._stores and self.directory:
+            directory = os.path.join(self.directory, re.sub(r'[^\w.-]', '_', model_id.strip('/')))
+            if dim is None:
+                # Read-only lookup before anything was computed: open the store only if it exists
+                meta_path = os.path.join(directory, 'meta.json')
+                if not os.path.exists(meta_path):
+                    return None
+                with open(meta_path, encoding='utf-8') as f:
+                    dim = json.load(f)['dim']
+            try:
+                store = _DiskStore(directory, dim, self.disk_size)
+            except FileNotFoundError:
+                store = None
+            self._stores[model_id] = store
+        return store
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.counters['memory_evictions'] += 1
+
+    def get(self, model_id: str, text: str) -> Optional[np.ndarray]:
+        """Cached float32 embedding of the normalized `text`, or None (counted as a miss)."""
+        key = (model_id, text_key(text))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return vector
+            store = self._store(model_id)
+            vector = store.get(key[1]) if store is not None else None
+            if vector is not None:
+                self._remember(key, vector)
+                self.counters['disk_hits'] += 1
+                return vector
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, model_id: str, text: str, vector: np.ndarray):
+        key = (model_id, text_key(text))
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            store = self._store(model_id, vector.shape[-1])
+            if store is not None and store.dim == vector.shape[-1] and store.put(key[1], vector):
+                self.counters['disk_evictions'] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.counters)
+            lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+            stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_entries'] = sum(len(store.index) for store in self._stores.values() if store is not None)
+            return stats
+
+    def flush(self):
+        with self._lock:
+            for store in self._stores.values():
+                if store is not None:
+                    store.flush()
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+CACHE = EmbeddingCache() if os.environ.get('EMBEDDING_CACHE', '1') != '0' else None
+
+if CACHE is not None:
+    atexit.register(CACHE.flush)
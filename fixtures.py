@@ -0,0 +1,102 @@
+"""
+Corpus de fixtures HTML para medir los parsers sin acceder a los proveedores.
+
+Con la variable de entorno RECORD_FIXTURES=<directorio>, cada scraper guarda
+el `page_source` que obtiene en <directorio>/<proveedor>/, junto con un .json
+con la URL y la fecha de captura. `load_fixtures` los vuelve a leer.
+Las respuestas XHR capturadas (p. ej. la disponibilidad de Avianca) se guardan
+igual con extensión .body y se leen con `load_responses`.
+"""
+from collections import namedtuple
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+import os
+
+RECORD_DIR = os.environ.get('RECORD_FIXTURES')
+DEFAULT_DIR = 'fixtures'
+
+Fixture = namedtuple('Fixture', ['provider', 'url', 'fetched_at', 'html', 'path'])
+Response = namedtuple('Response', ['provider', 'url', 'content_type', 'body', 'path'])
+
+
+def recording():
+    """Indica si el modo de grabación está activo"""
+    return bool(RECORD_DIR)
+
+
+def _record(provider, url, extension, data, meta, directory):
+    """Escribir `data` (bytes) y su .json de metadatos; devuelve la ruta o None si no se graba"""
+    directory = directory or RECORD_DIR
+    if not directory:
+        return None
+
+    fetched_at = datetime.now(timezone.utc)
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:10]
+    stem = os.path.join(directory, provider, f"{fetched_at:%Y%m%dT%H%M%S%f}-{digest}")
+    try:
+        os.makedirs(os.path.dirname(stem), exist_ok=True)
+        with open(stem + extension, 'wb') as f:
+            f.write(data)
+        with open(f'{stem}.json', 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, provider=provider, url=url, fetched_at=fetched_at.isoformat()), f)
+    except OSError as e:
+        logging.warning(f'No se pudo guardar la fixture de {provider}: {e}')
+        return None
+    logging.info(f'Fixture guardada: {stem}{extension}')
+    return stem + extension
+
+
+def record_page(provider, url, html, directory=None):
+    """Guardar una página obtenida por un scraper; devuelve la ruta del .html o None si no se graba"""
+    return _record(provider, url, '.html', html.encode('utf-8'), {'kind': 'page'}, directory)
+
+
+def record_response(provider, url, body, content_type='application/json', directory=None):
+    """Guardar el cuerpo (str o bytes) de una respuesta XHR capturada"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return _record(provider, url, '.body', body, {'kind': 'response', 'content_type': content_type}, directory)
+
+
+def _read_meta(path, extension):
+    meta_path = path[:-len(extension)] + '.json'
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_fixtures(provider, directory=DEFAULT_DIR):
+    """Fixtures guardadas de un proveedor, en orden de captura"""
+    folder = os.path.join(directory, provider)
+    if not os.path.isdir(folder):
+        return []
+
+    fixtures = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.html'):
+            continue
+        path = os.path.join(folder, name)
+        meta = _read_meta(path, '.html')
+        with open(path, encoding='utf-8') as f:
+            fixtures.append(Fixture(provider, meta.get('url'), meta.get('fetched_at'), f.read(), path))
+    return fixtures
+
+
+def load_responses(provider, directory=DEFAULT_DIR):
+    """Respuestas XHR guardadas de un proveedor, en orden de captura"""
+    folder = os.path.join(directory, provider)
+    if not os.path.isdir(folder):
+        return []
+
+    responses = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.body'):
+            continue
+        path = os.path.join(folder, name)
+        meta = _read_meta(path, '.body')
+        with open(path, 'rb') as f:
+            responses.append(Response(provider, meta.get('url'), meta.get('content_type'), f.read(), path))
+    return responses
@@ -0,0 +1,174 @@
+"""
+Ruta rápida por HTTP para los proveedores que entregan los resultados en el HTML.
+
+Antes de abrir Chrome, `try_http` descarga la página con una sesión de
+requests reutilizada (keep-alive, gzip, pool de conexiones por hilo) y la pasa
+por el parser del proveedor. Si la página trae al menos un registro válido
+según el proveedor (con hora o precio; una página de JavaScript puede dar filas
+vacías) se usan esos; si no, el scraper sigue por Selenium.
+
+Una página sin registros válidos solo cuenta como fallo de HTTP si Selenium sí
+encuentra viajes (`selenium_done`); si tampoco los encuentra, la ruta no tiene
+viajes y no es culpa de HTTP. Tras MISS_LIMIT fallos seguidos, el proveedor
+pasa directo a Selenium durante RETRY_HTTP_AFTER segundos, para no pagar dos
+descargas por trabajo en sitios que siempre necesitan JavaScript.
+
+FETCH_MODE=auto (por defecto), http (solo HTTP; una descarga fallida lanza
+HTTPFetchError) o selenium (nunca HTTP).
+La ruta usada en el último trabajo del hilo se lee con `last_path()`.
+"""
+import logging
+import os
+import threading
+import time
+
+import metrics
+from fixtures import record_page
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:  # Opcional: sin requests se usa siempre Selenium
+    requests = None
+
+FETCH_MODE = os.environ.get('FETCH_MODE', 'auto')
+TIMEOUT = 15  # Segundos por petición
+POOL_MAXSIZE = 10  # Conexiones abiertas por host en cada sesión
+MISS_LIMIT = 3
+RETRY_HTTP_AFTER = 600
+
+HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'es-CO,es;q=0.9',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+_misses = {}  # proveedor -> páginas seguidas sin resultados por HTTP
+_skip_until = {}  # proveedor -> hasta cuándo se pasa directo a Selenium
+
+
+class HTTPFetchError(Exception):
+    """La página no se pudo descargar por HTTP (solo se propaga con FETCH_MODE=http)"""
+
+
+def session():
+    """Sesión de requests del hilo actual (las conexiones se reutilizan entre trabajos)"""
+    current = getattr(_local, 'session', None)
+    if current is None:
+        current = _local.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+        current.mount('http://', adapter)
+        current.mount('https://', adapter)
+        current.headers.update(HEADERS)
+    return current
+
+
+def last_path():
+    """'http' o 'selenium' según la ruta que sirvió el último trabajo de este hilo (None si no aplica)"""
+    return getattr(_local, 'path', None)
+
+
+def reset_path():
+    _local.path = None
+    _local.unconfirmed = None
+
+
+def _set_path(provider, path):
+    _local.path = path
+    metrics.incr(provider, f'fetch_{path}')
+
+
+def http_enabled(provider, mode=None):
+    mode = mode or FETCH_MODE
+    if requests is None or mode == 'selenium':
+        return False
+    if mode == 'http':
+        return True
+    with _lock:
+        return time.monotonic() >= _skip_until.get(provider, 0)
+
+
+def _miss(provider):
+    with _lock:
+        _misses[provider] = _misses.get(provider, 0) + 1
+        if _misses[provider] >= MISS_LIMIT:
+            _misses[provider] = 0
+            _skip_until[provider] = time.monotonic() + RETRY_HTTP_AFTER
+            logging.info(f'{provider}: los resultados requieren JavaScript, se usa Selenium '
+                         f'durante {RETRY_HTTP_AFTER}s')
+
+
+def fetch_html(provider, url):
+    """HTML de `url` por HTTP; lanza HTTPFetchError si la petición falla o no devuelve HTML"""
+    if requests is None:
+        raise HTTPFetchError('requests no está instalado')
+    try:
+        with metrics.stage(provider, 'http_get'):
+            response = session().get(url, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        raise HTTPFetchError(f'fallo la petición HTTP a {url}: {e}') from e
+    content_type = response.headers.get('Content-Type', '')
+    if response.status_code != 200 or 'html' not in content_type:
+        raise HTTPFetchError(f'respuesta HTTP {response.status_code} ({content_type or "sin tipo"}) '
+                             f'no utilizable para {url}')
+    metrics.incr(provider, 'http_bytes', len(response.content))
+    # Sin charset en la cabecera requests asume ISO-8859-1 y rompe las tildes; se detecta del contenido
+    if 'charset' not in content_type.lower():
+        response.encoding = response.apparent_encoding
+    return response.text
+
+
+def try_http(provider, url, parse, mode=None, is_valid=bool):
+    """
+    Registros de `url` obtenidos por HTTP y `parse(html)`, o None si hay que usar Selenium.
+    La página se acepta si `is_valid(registro)` es cierto para al menos un registro.
+    Con mode='http' no hay respaldo: una descarga fallida lanza HTTPFetchError para que el
+    trabajo cuente como error y se reintente, en lugar de parecer una ruta sin viajes.
+    La ruta elegida queda registrada en `last_path()` y en los contadores fetch_http/fetch_selenium.
+    """
+    mode = mode or FETCH_MODE
+    _local.unconfirmed = None
+    if mode == 'http':
+        _set_path(provider, 'http')
+        html = fetch_html(provider, url)
+        with metrics.stage(provider, 'parse'):
+            records = parse(html)
+        record_page(provider, url, html)
+        return records
+    if http_enabled(provider, mode):
+        try:
+            html = fetch_html(provider, url)
+        except HTTPFetchError as e:
+            logging.warning(f'{provider}: {e}')
+            html = None
+        if html is not None:
+            with metrics.stage(provider, 'parse'):
+                records = parse(html)
+            if any(is_valid(record) for record in records):
+                with _lock:
+                    _misses[provider] = 0
+                record_page(provider, url, html)
+                _set_path(provider, 'http')
+                return records
+            # Puede ser una ruta sin viajes: el fallo se decide cuando Selenium termine
+            _local.unconfirmed = provider
+        else:
+            _miss(provider)
+    _set_path(provider, 'selenium')
+    return None
+
+
+def selenium_done(provider, found):
+    """
+    Avisar que el respaldo con Selenium terminó. Si la página HTTP no traía viajes pero Selenium
+    sí los encontró (`found`), HTTP falló de verdad y cuenta para MISS_LIMIT.
+    """
+    if getattr(_local, 'unconfirmed', None) != provider:
+        return
+    _local.unconfirmed = None
+    if found:
+        _miss(provider)
@@ -0,0 +1,518 @@
+"""
+Cola de trabajos de scraping compartida entre varios procesos o máquinas.
+
+Los trabajos (proveedor, origen, destino, fecha) se encolan una vez y los
+workers los reclaman con un lease: mientras trabajan renuevan el lease y, si
+un worker muere, el lease vence y otro worker retoma el trabajo. Los fallos se
+reintentan con `avianca.get_exponential_backoff` hasta MAX_ATTEMPTS; un trabajo
+que tumba a su worker en todos los intentos también se marca como fallido.
+
+Backends:
+    sqlite:jobs.db            un solo host (varios procesos)
+    redis://host:6379/0       varios hosts (Redis o cualquier servidor compatible)
+
+Ejemplo:
+    python job_queue.py --queue sqlite:jobs.db enqueue --job omega:bucaramanga:bogota --days 7
+    python job_queue.py --queue sqlite:jobs.db worker --processes 3 --sink jsonl:viajes.jsonl
+    python job_queue.py --queue sqlite:jobs.db stats
+"""
+from collections import namedtuple
+from datetime import date
+import argparse
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # Opcional: solo se necesita para el backend de Redis
+    redis = None
+
+DEFAULT_QUEUE = os.environ.get('JOB_QUEUE', 'sqlite:jobs.db')
+LEASE_SECONDS = 300  # Un worker que no renueva su lease en este tiempo se da por caído
+MAX_ATTEMPTS = 5
+IDLE_POLL = 2.0  # Segundos entre consultas cuando no hay trabajos disponibles
+RESPAWN_DELAY = 5.0  # Segundos antes de reemplazar un proceso worker que murió (se duplica en cada caída seguida)
+MAX_RESPAWNS = 5  # Caídas seguidas de un proceso (cada una antes de HEALTHY_SECONDS) antes de no reemplazarlo más
+HEALTHY_SECONDS = 60.0  # Un proceso que vivió al menos esto reinicia la cuenta de caídas
+CRASHED = 'El worker se detuvo en todos los intentos (lease vencido)'
+
+QueuedJob = namedtuple('QueuedJob', ['id', 'provider', 'origin', 'destination', 'date', 'attempts'])
+
+
+def job_key(provider, origin, destination, fecha):
+    return f'{provider}:{origin}:{destination}:{fecha}'
+
+
+class SQLiteQueue:
+    """Cola en un archivo SQLite (modo WAL); cada hilo usa su propia conexión"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                provider TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                date TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_until REAL,
+                worker TEXT,
+                url TEXT,
+                records INTEGER,
+                seconds REAL,
+                fetch TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            -- Un mismo trabajo no puede estar dos veces pendiente o en curso
+            CREATE UNIQUE INDEX IF NOT EXISTS jobs_active
+                ON jobs (provider, origin, destination, date)
+                WHERE status IN ('pending', 'running');
+            CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at);
+        """)
+        # Migración: las colas creadas antes de registrar la ruta de descarga no tienen la columna fetch
+        columns = {row[1] for row in self._connection().execute('PRAGMA table_info(jobs)')}
+        if 'fetch' not in columns:
+            self._connection().execute('ALTER TABLE jobs ADD COLUMN fetch TEXT')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def enqueue(self, jobs):
+        """Encolar trabajos (scheduler.Job); devuelve cuántos eran nuevos"""
+        now = time.time()
+        added = 0
+        with self._transaction() as conn:
+            for job in jobs:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO jobs (provider, origin, destination, date, available_at, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (job.provider, job.origin, job.destination, job.date, now, now),
+                )
+                added += cursor.rowcount
+        return added
+
+    def claim(self, worker, lease=LEASE_SECONDS):
+        """Reclamar el siguiente trabajo disponible (o uno con el lease vencido)"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Un trabajo cuyo worker murió en todos los intentos no se vuelve a repartir
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (CRASHED, now, now, MAX_ATTEMPTS),
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'pending', worker = NULL WHERE status = 'running' AND lease_until < ?",
+                (now,),
+            )
+            row = conn.execute(
+                "SELECT id, provider, origin, destination, date, attempts FROM jobs "
+                "WHERE status = 'pending' AND available_at <= ? ORDER BY available_at, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (worker, now + lease, row[0]),
+            )
+        return QueuedJob(*row[:5], row[5] + 1)
+
+    def expire_worker(self, worker):
+        """Dar por vencidos ya los leases de un worker que murió (el siguiente `claim` los recupera)"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET lease_until = 0 WHERE status = 'running' AND worker = ?", (worker,))
+
+    def heartbeat(self, job_id, worker, lease=LEASE_SECONDS):
+        """Renovar el lease; devuelve False si el trabajo ya no pertenece a este worker"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + lease, job_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, url, records, seconds, fetch=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', url = ?, records = ?, seconds = ?, fetch = ?, error = NULL, "
+                "finished_at = ?, lease_until = NULL WHERE id = ? AND worker = ?",
+                (url, records, seconds, fetch, time.time(), job_id, worker),
+            )
+
+    def fail(self, job_id, worker, error, retry_in=None):
+        """Devolver el trabajo a la cola dentro de `retry_in` segundos, o marcarlo como fallido si es None"""
+        now = time.time()
+        with self._transaction() as conn:
+            if retry_in is None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL "
+                    "WHERE id = ? AND worker = ?",
+                    (error, now, job_id, worker),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = 'pending', error = ?, available_at = ?, worker = NULL, "
+                    "lease_until = NULL WHERE id = ? AND worker = ?",
+                    (error, now + retry_in, job_id, worker),
+                )
+
+    def stats(self):
+        """Trabajos por estado y, para los terminados, registros, duración media y ruta (http/selenium) por proveedor"""
+        with self._transaction() as conn:
+            by_status = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            providers = {
+                provider: {'done': done, 'records': records or 0, 'avg_seconds': round(avg or 0, 2), 'fetch': {}}
+                for provider, done, records, avg in conn.execute(
+                    "SELECT provider, COUNT(*), SUM(records), AVG(seconds) FROM jobs "
+                    "WHERE status = 'done' GROUP BY provider"
+                )
+            }
+            for provider, fetch, count in conn.execute(
+                "SELECT provider, COALESCE(fetch, 'selenium'), COUNT(*) FROM jobs "
+                "WHERE status = 'done' GROUP BY provider, 2"
+            ):
+                providers[provider]['fetch'][fetch] = count
+        return {'status': by_status, 'providers': providers}
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT sobre una conexión en modo autocommit"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class RedisQueue:
+    """
+    Cola en Redis: un ZSET de pendientes (puntuación = disponible desde), un ZSET
+    de leases (puntuación = vencimiento) y un HASH por trabajo. Solo usa comandos
+    básicos (sin Lua), así que sirve cualquier servidor compatible.
+    """
+
+    def __init__(self, url, prefix='wayra:jobs'):
+        if redis is None:
+            raise ImportError('El backend de Redis requiere el paquete redis (pip install redis)')
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.pending = f'{prefix}:pending'
+        self.leases = f'{prefix}:leases'
+
+    def _job(self, job_id):
+        return f'{self.prefix}:job:{job_id}'
+
+    def _active(self, key):
+        return f'{self.prefix}:active:{key}'
+
+    def enqueue(self, jobs):
+        now = time.time()
+        added = 0
+        for job in jobs:
+            key = job_key(job.provider, job.origin, job.destination, job.date)
+            active = self._active(key)
+            job_id = str(self.client.incr(f'{self.prefix}:seq'))
+            while True:
+                with self.client.pipeline() as pipe:
+                    try:
+                        pipe.watch(active)
+                        # Un mismo trabajo no puede estar dos veces pendiente o en curso (una clave
+                        # activa sin trabajo detrás, de versiones anteriores, no cuenta)
+                        current = pipe.get(active)
+                        if current and pipe.exists(self._job(current)):
+                            pipe.unwatch()
+                            break
+                        # La clave activa y el trabajo se escriben juntos en un MULTI
+                        pipe.multi()
+                        pipe.set(active, job_id)
+                        pipe.hset(self._job(job_id), mapping={
+                            'provider': job.provider, 'origin': job.origin, 'destination': job.destination,
+                            'date': job.date, 'status': 'pending', 'attempts': 0, 'key': key, 'created_at': now,
+                        })
+                        pipe.zadd(self.pending, {job_id: now})
+                        pipe.execute()
+                        added += 1
+                        break
+                    except redis.WatchError:
+                        continue  # Otro proceso encoló la misma ruta; se vuelve a comprobar
+        return added
+
+    def _requeue_expired(self, now):
+        for job_id in self.client.zrangebyscore(self.leases, '-inf', now):
+            # Solo quien consigue quitarlo de los leases lo devuelve a pendientes
+            if not self.client.zrem(self.leases, job_id):
+                continue
+            job = self._job(job_id)
+            pipe = self.client.pipeline()
+            if int(self.client.hget(job, 'attempts') or 0) >= MAX_ATTEMPTS:
+                # Un trabajo cuyo worker murió en todos los intentos no se vuelve a repartir
+                pipe.hset(job, mapping={'status': 'failed', 'worker': '', 'error': CRASHED, 'finished_at': now})
+                pipe.delete(self._active(self.client.hget(job, 'key')))
+            else:
+                pipe.hset(job, mapping={'status': 'pending', 'worker': ''})
+                pipe.zadd(self.pending, {job_id: now})
+            pipe.execute()
+
+    def expire_worker(self, worker):
+        for job_id in self.client.zrange(self.leases, 0, -1):
+            if self.client.hget(self._job(job_id), 'worker') == worker:
+                self.client.zadd(self.leases, {job_id: 0}, xx=True)
+
+    def claim(self, worker, lease=LEASE_SECONDS):
+        now = time.time()
+        self._requeue_expired(now)
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.pending)
+                    candidates = pipe.zrangebyscore(self.pending, '-inf', now, start=0, num=1)
+                    if not candidates:
+                        pipe.unwatch()
+                        return None
+                    job_id = candidates[0]
+                    pipe.multi()
+                    pipe.zrem(self.pending, job_id)
+                    pipe.zadd(self.leases, {job_id: now + lease})
+                    pipe.hset(self._job(job_id), mapping={'status': 'running', 'worker': worker})
+                    pipe.hincrby(self._job(job_id), 'attempts', 1)
+                    pipe.execute()
+                    break
+                except redis.WatchError:
+                    continue  # Otro worker tocó la cola; se vuelve a intentar
+        data = self.client.hgetall(self._job(job_id))
+        return QueuedJob(int(job_id), data['provider'], data['origin'], data['destination'],
+                         data['date'], int(data['attempts']))
+
+    def heartbeat(self, job_id, worker, lease=LEASE_SECONDS):
+        if self.client.hget(self._job(job_id), 'worker') != worker:
+            return False
+        self.client.zadd(self.leases, {str(job_id): time.time() + lease}, xx=True)
+        return True
+
+    def _finish(self, job_id, worker, fields):
+        job = self._job(job_id)
+        if self.client.hget(job, 'worker') != worker:
+            return
+        key = self.client.hget(job, 'key')
+        pipe = self.client.pipeline()
+        pipe.zrem(self.leases, str(job_id))
+        pipe.hset(job, mapping=dict(fields, finished_at=time.time()))
+        pipe.delete(self._active(key))
+        pipe.execute()
+
+    def complete(self, job_id, worker, url, records, seconds, fetch=None):
+        self._finish(job_id, worker, {'status': 'done', 'url': url or '', 'records': records,
+                                      'seconds': seconds, 'fetch': fetch or '', 'error': ''})
+
+    def fail(self, job_id, worker, error, retry_in=None):
+        if retry_in is None:
+            self._finish(job_id, worker, {'status': 'failed', 'error': error})
+            return
+        job = self._job(job_id)
+        if self.client.hget(job, 'worker') != worker:
+            return
+        pipe = self.client.pipeline()
+        pipe.zrem(self.leases, str(job_id))
+        pipe.hset(job, mapping={'status': 'pending', 'worker': '', 'error': error})
+        pipe.zadd(self.pending, {str(job_id): time.time() + retry_in})
+        pipe.execute()
+
+    def stats(self):
+        by_status = {}
+        providers = {}
+        for job in self.client.scan_iter(f'{self.prefix}:job:*'):
+            data = self.client.hgetall(job)
+            by_status[data.get('status')] = by_status.get(data.get('status'), 0) + 1
+            if data.get('status') == 'done':
+                stats = providers.setdefault(data['provider'], {'done': 0, 'records': 0, 'seconds': 0.0, 'fetch': {}})
+                stats['done'] += 1
+                fetch = data.get('fetch') or 'selenium'
+                stats['fetch'][fetch] = stats['fetch'].get(fetch, 0) + 1
+                stats['records'] += int(data.get('records') or 0)
+                stats['seconds'] += float(data.get('seconds') or 0)
+        for stats in providers.values():
+            stats['avg_seconds'] = round(stats.pop('seconds') / stats['done'], 2)
+        return {'status': by_status, 'providers': providers}
+
+
+def open_queue(spec=DEFAULT_QUEUE):
+    """Abrir la cola a partir de 'sqlite:<ruta>' o 'redis://...'"""
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisQueue(spec)
+    if spec.startswith('sqlite:'):
+        return SQLiteQueue(spec[len('sqlite:'):])
+    raise ValueError(f'Cola desconocida: {spec}')
+
+
+def _keep_lease(queue, job, worker, lease, stop):
+    """Renovar el lease cada tercio de su duración mientras el trabajo sigue en curso"""
+    while not stop.wait(lease / 3):
+        if not queue.heartbeat(job.id, worker, lease):
+            logging.warning(f'El trabajo {job.id} ya no pertenece a {worker}')
+            return
+
+
+def run_worker(queue, worker=None, pipeline=None, lease=LEASE_SECONDS, max_jobs=None, exit_when_idle=False):
+    """Reclamar y ejecutar trabajos hasta `max_jobs` (o hasta vaciar la cola con `exit_when_idle`)"""
+    from avianca import get_exponential_backoff
+    from scheduler import Job, run_job
+
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    done = 0
+    while max_jobs is None or done < max_jobs:
+        job = queue.claim(worker, lease)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(IDLE_POLL)
+            continue
+
+        stop = threading.Event()
+        keeper = threading.Thread(target=_keep_lease, args=(queue, job, worker, lease, stop), daemon=True)
+        keeper.start()
+        try:
+            result = run_job(Job(job.provider, job.origin, job.destination, job.date), pipeline)
+        finally:
+            stop.set()
+            keeper.join()
+
+        if result.error is None:
+            queue.complete(job.id, worker, result.url, result.count, result.seconds, result.fetch)
+            logging.info(f'[{worker}] trabajo {job.id} {job.provider} {job.origin}->{job.destination} '
+                         f'{job.date}: {result.count} registros en {result.seconds:.1f}s ({result.fetch or "selenium"})')
+        elif job.attempts < MAX_ATTEMPTS:
+            retry_in = get_exponential_backoff(job.attempts - 1)
+            queue.fail(job.id, worker, result.error, retry_in)
+            logging.warning(f'[{worker}] trabajo {job.id} falló (intento {job.attempts}), '
+                            f'se reintenta en {retry_in:.0f}s: {result.error}')
+        else:
+            queue.fail(job.id, worker, result.error)
+            logging.error(f'[{worker}] trabajo {job.id} descartado tras {job.attempts} intentos: {result.error}')
+        done += 1
+    return done
+
+
+def _worker_process(spec, sinks, lease, exit_when_idle):
+    from pipeline import Pipeline, sink_from_spec
+    from scheduler import record_key
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(message)s')
+    pipeline = Pipeline([sink_from_spec(s, record_key) for s in sinks]) if sinks else None
+    try:
+        run_worker(open_queue(spec), pipeline=pipeline, lease=lease, exit_when_idle=exit_when_idle)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+
+def supervise_workers(spec, count, sinks=(), lease=LEASE_SECONDS, exit_when_idle=False):
+    """
+    Lanzar `count` procesos worker y reemplazar los que mueren (por ejemplo si Chrome tumba el proceso).
+    Los leases del proceso muerto se vencen enseguida, así que su trabajo vuelve a la cola sin esperar
+    LEASE_SECONDS y, si ya agotó MAX_ATTEMPTS, queda como fallido.
+    Un proceso que cae MAX_RESPAWNS veces seguidas poco después de arrancar (por ejemplo por un error
+    de configuración) no se reemplaza más; devuelve cuántos procesos se abandonaron así.
+    """
+    queue = open_queue(spec)
+    started = {}
+    crashes = dict.fromkeys(range(count), 0)
+    abandoned = 0
+
+    def start(index):
+        process = multiprocessing.Process(target=_worker_process, name=f'worker-{index}',
+                                          args=(spec, list(sinks), lease, exit_when_idle))
+        process.start()
+        started[index] = time.monotonic()
+        return process
+
+    processes = {index: start(index) for index in range(count)}
+    while processes:
+        multiprocessing.connection.wait([process.sentinel for process in processes.values()])
+        for index, process in list(processes.items()):
+            if process.is_alive():
+                continue
+            del processes[index]
+            if process.exitcode == 0:
+                continue
+            queue.expire_worker(f'{socket.gethostname()}:{process.pid}')
+            crashes[index] = 1 if time.monotonic() - started[index] >= HEALTHY_SECONDS else crashes[index] + 1
+            if crashes[index] > MAX_RESPAWNS:
+                logging.error(f'{process.name} cayó {crashes[index]} veces seguidas al arrancar '
+                              f'(código {process.exitcode}); no se reemplaza')
+                abandoned += 1
+                continue
+            delay = RESPAWN_DELAY * 2 ** (crashes[index] - 1)
+            logging.warning(f'{process.name} terminó con código {process.exitcode}; '
+                            f'se lanza un reemplazo en {delay:.0f}s')
+            time.sleep(delay)
+            processes[index] = start(index)
+    return abandoned
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cola distribuida de trabajos de scraping')
+    parser.add_argument('--queue', default=DEFAULT_QUEUE, help='sqlite:<ruta> o redis://host:puerto/db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='Encolar trabajos')
+    enqueue.add_argument('--job', action='append', required=True, help='proveedor:origen:destino')
+    enqueue.add_argument('--start', default=date.today().isoformat())
+    enqueue.add_argument('--days', type=int, default=1)
+
+    worker = commands.add_parser('worker', help='Ejecutar workers en este host')
+    worker.add_argument('--processes', type=int, default=1)
+    worker.add_argument('--sink', action='append', default=[],
+                        help='stdout, jsonl:<ruta>, parquet:<dir> o mongo:<base>/<colección>')
+    worker.add_argument('--lease', type=float, default=LEASE_SECONDS)
+    worker.add_argument('--exit-when-idle', action='store_true', help='Terminar cuando no queden trabajos')
+
+    commands.add_parser('stats', help='Estado de la cola')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'enqueue':
+        from scheduler import expand_jobs
+
+        jobs = []
+        for spec in args.job:
+            provider, origin, destination = spec.split(':')
+            jobs.extend(expand_jobs(provider, [(origin, destination)], args.start, args.days))
+        added = open_queue(args.queue).enqueue(jobs)
+        print(f'{added} trabajos encolados ({len(jobs) - added} ya estaban pendientes)')
+    elif args.command == 'worker':
+        if supervise_workers(args.queue, args.processes, args.sink, args.lease, args.exit_when_idle):
+            raise SystemExit(1)
+    else:
+        print(json.dumps(open_queue(args.queue).stats(), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
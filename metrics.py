@@ -0,0 +1,198 @@
+"""
+Métricas por etapa de los scrapers.
+
+Cada scraper envuelve sus etapas (arranque de Chrome, driver.get, esperas,
+paginación, parseo, escritura en MongoDB) con `stage` y suma contadores con
+`incr` (registros, bytes de página, reintentos). Las métricas se exponen en
+formato de texto de Prometheus (archivo para el textfile collector o endpoint
+HTTP) y como resumen JSON de la ejecución:
+
+    with metrics.stage('omega', 'get'):
+        driver.get(url)
+    metrics.incr('omega', 'records', len(viajes))
+
+    metrics.write_textfile('wayra.prom')
+    print(json.dumps(metrics.summary(), indent=2))
+
+`export()` escribe ambos formatos en las rutas de METRICS_FILE y
+METRICS_SUMMARY al terminar una ejecución.
+"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import threading
+import time
+
+import profiling
+
+PREFIX = 'wayra'
+TEXTFILE = os.environ.get('METRICS_FILE')  # Archivo .prom para node_exporter
+SUMMARY_FILE = os.environ.get('METRICS_SUMMARY')  # Resumen JSON de la ejecución
+# Límites superiores (segundos) de los buckets del histograma de etapas
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_stages = {}  # (proveedor, etapa) -> {'count', 'sum', 'max', 'buckets'}
+_counters = {}  # (proveedor, nombre) -> valor
+_errors = {}  # (proveedor, etapa) -> errores
+_started = time.time()
+
+
+def observe(provider, name, seconds):
+    """Registrar la duración de una etapa"""
+    with _lock:
+        data = _stages.get((provider, name))
+        if data is None:
+            data = _stages[(provider, name)] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+        data['count'] += 1
+        data['sum'] += seconds
+        data['max'] = max(data['max'], seconds)
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                data['buckets'][index] += 1
+
+
+def incr(provider, name, value=1):
+    """Sumar `value` al contador `name` del proveedor (registros, bytes, reintentos...)"""
+    with _lock:
+        _counters[(provider, name)] = _counters.get((provider, name), 0) + value
+
+
+def error(provider, name):
+    """Contar un error en la etapa `name`"""
+    with _lock:
+        _errors[(provider, name)] = _errors.get((provider, name), 0) + 1
+
+
+@contextmanager
+def stage(provider, name):
+    """
+    Medir el bloque como la etapa `name`; las excepciones cuentan como error y se propagan.
+    Si PROFILE_STAGE coincide con la etapa, el bloque también se perfila.
+    """
+    started = time.perf_counter()
+    try:
+        with profiling.stage_profiler(provider, name):
+            yield
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            error(provider, name)
+        raise
+    finally:
+        observe(provider, name, time.perf_counter() - started)
+
+
+def reset():
+    """Borrar todas las métricas (por ejemplo entre ejecuciones de benchmark)"""
+    global _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _errors.clear()
+        _started = time.time()
+
+
+def summary():
+    """Resumen JSON-serializable por proveedor: etapas, contadores y errores"""
+    with _lock:
+        providers = {}
+        for (provider, name), data in sorted(_stages.items()):
+            stages = providers.setdefault(provider, {'stages': {}, 'counters': {}, 'errors': {}})['stages']
+            stages[name] = {
+                'count': data['count'],
+                'total_seconds': round(data['sum'], 3),
+                'avg_seconds': round(data['sum'] / data['count'], 3),
+                'max_seconds': round(data['max'], 3),
+            }
+        for (provider, name), value in sorted(_counters.items()):
+            providers.setdefault(provider, {'stages': {}, 'counters': {}, 'errors': {}})['counters'][name] = value
+        for (provider, name), value in sorted(_errors.items()):
+            providers.setdefault(provider, {'stages': {}, 'counters': {}, 'errors': {}})['errors'][name] = value
+        return {'started': _started, 'seconds': round(time.time() - _started, 2), 'providers': providers}
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def prometheus_text():
+    """Métricas en el formato de exposición de texto de Prometheus"""
+    lines = [
+        f'# HELP {PREFIX}_stage_seconds Duración de cada etapa del scraping',
+        f'# TYPE {PREFIX}_stage_seconds histogram',
+    ]
+    with _lock:
+        stages = sorted(_stages.items())
+        counters = sorted(_counters.items())
+        errors = sorted(_errors.items())
+
+        for (provider, name), data in stages:
+            labels = _labels(provider=provider, stage=name)
+            for bound, count in zip(BUCKETS, data['buckets']):
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{{labels},le="+Inf"}} {data["count"]}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{{labels}}} {data["sum"]:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{{labels}}} {data["count"]}')
+
+        lines.append(f'# HELP {PREFIX}_stage_max_seconds Duración máxima observada de cada etapa')
+        lines.append(f'# TYPE {PREFIX}_stage_max_seconds gauge')
+        for (provider, name), data in stages:
+            lines.append(f'{PREFIX}_stage_max_seconds{{{_labels(provider=provider, stage=name)}}} {data["max"]:.6f}')
+
+        for name in sorted({name for (_, name), _ in counters}):
+            lines.append(f'# TYPE {PREFIX}_{name}_total counter')
+            for (provider, counter), value in counters:
+                if counter == name:
+                    lines.append(f'{PREFIX}_{name}_total{{{_labels(provider=provider)}}} {value}')
+
+        lines.append(f'# HELP {PREFIX}_errors_total Errores por etapa')
+        lines.append(f'# TYPE {PREFIX}_errors_total counter')
+        for (provider, name), value in errors:
+            lines.append(f'{PREFIX}_errors_total{{{_labels(provider=provider, stage=name)}}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path):
+    """Escribir las métricas para el textfile collector de node_exporter (reemplazo atómico)"""
+    temporal = f'{path}.{os.getpid()}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+    os.replace(temporal, path)
+
+
+def export(textfile=None, summary_file=None):
+    """Escribir el archivo de Prometheus y el resumen JSON en las rutas configuradas"""
+    textfile = textfile or TEXTFILE
+    summary_file = summary_file or SUMMARY_FILE
+    if textfile:
+        write_textfile(textfile)
+        logging.info(f'Métricas de Prometheus escritas en {textfile}')
+    if summary_file:
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump(summary(), f, ensure_ascii=False, indent=2)
+        logging.info(f'Resumen de métricas escrito en {summary_file}')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Sin una línea de log por cada scrape de Prometheus
+
+
+def serve(port, host='0.0.0.0'):
+    """Exponer /metrics en un hilo en segundo plano; devuelve el servidor"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,131 @@
+"""
+Escritura por lotes e idempotente en MongoDB.
+
+`BulkWriter` acumula documentos y los envía con `bulk_write` como upserts
+sobre una clave estable (campo `clave`), de modo que volver a ejecutar un
+scraper actualiza los documentos existentes en lugar de duplicarlos.
+Un hilo en segundo plano envía el búfer cuando vence `flush_interval`, aunque
+no lleguen documentos nuevos (por ejemplo si el crawl se detiene).
+Si MongoDB no responde (AutoReconnect, timeouts), el lote vuelve al búfer para
+el siguiente envío y el error se propaga; `close()` lo lanza si aún no se pudo
+enviar, así los documentos nunca se pierden en silencio.
+"""
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+import logging
+import threading
+import time
+
+import metrics
+
+KEY_FIELD = 'clave'
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 5.0  # Segundos máximos que un documento espera en el búfer
+
+
+class BulkWriter:
+    """Búfer de upserts sobre `collection`; `key_func(doc)` devuelve la clave estable del documento"""
+
+    def __init__(self, collection, key_func, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.collection = collection
+        self.key_func = key_func
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+        self.label = f"mongo:{getattr(collection, 'name', 'collection')}"  # Etiqueta en las métricas
+        self._buffer = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._flusher = None
+
+    def ensure_index(self):
+        """Crear el índice único sobre la clave (solo para documentos que ya la tienen)"""
+        try:
+            self.collection.create_index(
+                KEY_FIELD,
+                unique=True,
+                partialFilterExpression={KEY_FIELD: {'$exists': True}},
+            )
+        except OperationFailure as e:
+            logging.warning(f'No se pudo crear el índice único sobre {KEY_FIELD}: {e}')
+
+    def add(self, doc):
+        """Encolar un documento; se envía al llenar el lote o al vencer el intervalo"""
+        key = self.key_func(doc)
+        with self._lock:
+            if self._flusher is None and self.flush_interval:
+                self._flusher = threading.Thread(target=self._flush_periodically, name=f'flush-{self.label}',
+                                                 daemon=True)
+                self._flusher.start()
+            # Dentro de un lote gana la última versión de cada clave
+            self._buffer[key] = dict(doc, **{KEY_FIELD: key})
+            if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def _flush_periodically(self):
+        """Enviar el búfer cuando vence el intervalo aunque no lleguen documentos nuevos"""
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                if not self._buffer or time.monotonic() - self._last_flush < self.flush_interval:
+                    continue
+                try:
+                    self.flush()
+                except Exception as e:
+                    logging.error(f'Error al enviar el búfer de {self.label} a MongoDB: {e}')
+
+    def flush(self):
+        """Enviar el búfer con un solo bulk_write desordenado"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._buffer:
+                return
+            pending, self._buffer = self._buffer, {}
+            operations = [
+                UpdateOne({KEY_FIELD: key}, {'$set': doc}, upsert=True)
+                for key, doc in pending.items()
+            ]
+            try:
+                self._write(operations)
+            except PyMongoError:
+                # El lote vuelve al búfer para el próximo envío, sin pisar versiones más nuevas
+                self._buffer = {**pending, **self._buffer}
+                raise
+
+    def _write(self, operations):
+        try:
+            with metrics.stage(self.label, 'bulk_write'):
+                result = self.collection.bulk_write(operations, ordered=False)
+            inserted, matched, modified = result.upserted_count, result.matched_count, result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            inserted, matched, modified = details['nUpserted'], details['nMatched'], details['nModified']
+            self.stats['errors'] += len(details['writeErrors'])
+            logging.error(f'{len(details["writeErrors"])} documentos fallaron en bulk_write: '
+                          f'{details["writeErrors"][0]["errmsg"]}')
+        except PyMongoError as e:
+            # Error de conexión o de servidor: no se escribió nada que se pueda contar
+            self.stats['errors'] += len(operations)
+            logging.error(f'No se pudo enviar el lote de {len(operations)} documentos a MongoDB: {e}')
+            raise
+
+        metrics.incr(self.label, 'documents', len(operations))
+        self.stats['inserted'] += inserted
+        self.stats['updated'] += modified
+        self.stats['unchanged'] += matched - modified
+        logging.info(f'Lote de {len(operations)} documentos enviado a MongoDB '
+                     f'(nuevos: {inserted}, actualizados: {modified}, sin cambios: {matched - modified})')
+
+    def close(self):
+        """Detener el envío periódico, enviar lo pendiente y devolver los contadores acumulados"""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
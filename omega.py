@@ -1,12 +1,68 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
-import time
+from chrome_startup import create_driver
+from driver_pool import get_pool
+from fixtures import record_page
+from http_fetch import selenium_done, try_http
+from resource_blocking import with_profile, install_blocking
+from readiness import install_network_tracker, wait_until_ready
+from records import cop, minutos
+from urllib.parse import urlencode, quote
+import metrics
+import os
+import profiling
 
-def configurar_selenium():
+try:
+    from lxml import html as lxml_html
+except ImportError:  # Sin lxml se usa siempre el parser de BeautifulSoup
+    lxml_html = None
+
+# Origen del sitio; OMEGA_BASE_URL permite apuntar al servidor de réplica local
+BASE_URL = os.environ.get("OMEGA_BASE_URL", "https://omega.redbus.co")
+SEARCH_PATH = "/searchbus"
+
+# Usar el parser rápido de lxml (False = BeautifulSoup sobre toda la página)
+PARSER_RAPIDO = True
+
+# Clases (valor exacto del atributo class) de los bloques de resultados
+CLASE_CONTENEDOR = "container-lg border-bottom resultContainer d-flex flex-column justify-content-center"
+CLASE_HORARIO = "time_and_city col d-flex flex-column justify-content-center align-items-center"
+CLASE_TERMINAL = "font_12 text-secondary"
+CLASE_TIPO_SERVICIO = "col time_and_city text-center d-flex flex-column justify-content-center"
+CLASE_ASIENTOS = "col time_and_city d-flex flex-column justify-content-center align-items-center max_width_150"
+CLASE_PRECIO = "view_seats_button text-center"
+CAMPOS_POR_CLASE = {
+    CLASE_TIPO_SERVICIO: "tipo_servicio",
+    CLASE_ASIENTOS: "asientos",
+    CLASE_PRECIO: "precio",
+}
+
+# Ciudades conocidas: clave -> (fromcityID/tocityID, nombre de la terminal)
+CIUDADES = {
+    "bucaramanga": (195236, "Term. BUCARAMANGA"),
+    "bogota": (195201, "Term. BOGOTA SALITRE"),
+}
+
+def construir_url(origen, destino, fecha):
+    """
+    Construye la URL de búsqueda de Omega para una ruta y fecha (AAAA-MM-DD)
     """
-    Configura el navegador Chrome para Selenium
+    if origen not in CIUDADES or destino not in CIUDADES:
+        raise ValueError(f"Ciudad desconocida para Omega: {origen} -> {destino}")
+    origen_id, origen_nombre = CIUDADES[origen]
+    destino_id, destino_nombre = CIUDADES[destino]
+    params = {
+        "fromcityID": origen_id,
+        "tocityID": destino_id,
+        "fromcity": origen_nombre,
+        "tocity": destino_nombre,
+        "datePicker": fecha,
+    }
+    return f"{BASE_URL}{SEARCH_PATH}?{urlencode(params, quote_via=quote)}"
+
+def configurar_selenium(bloquear_recursos=None):
+    """
+    Configura el navegador Chrome para Selenium (con el perfil de bloqueo de recursos salvo que se desactive)
     """
     options = Options()
     options.add_argument("--headless")
@@ -18,8 +74,11 @@ def configurar_selenium():
     options.add_argument("--disable-blink-features=AutomationControlled")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option("useAutomationExtension", False)
-    service = Service()
-    return webdriver.Chrome(service=service, options=options)
+    options = with_profile(options, "omega", bloquear_recursos)
+    # chromedriver ya resuelto y perfil plantilla: el arranque no repite la resolución
+    driver = create_driver(options)
+    install_blocking(driver, "omega", bloquear_recursos)
+    return driver
 
 def convertir_a_am_pm(hora, periodo):
     """
@@ -38,83 +97,192 @@ def convertir_a_am_pm(hora, periodo):
 
     return f"{hora} {sufijo}"
 
+def obtener_pool():
+    """
+    Devuelve el pool de navegadores compartido de Omega
+    """
+    return get_pool("omega", configurar_selenium)
+
 def obtener_info_viajes(url):
     """
-    Obtiene la información de los viajes usando Selenium y BeautifulSoup
+    Obtiene la información de los viajes (por HTTP o con Selenium) y el parser de HTML configurado
+    """
+    return list(iterar_viajes(url))
+
+def viaje_valido(viaje):
+    """
+    Un viaje real trae al menos la hora de salida o el precio (una página sin renderizar da filas vacías)
+    """
+    return minutos(viaje["hora_salida_am_pm"]) is not None or cop(viaje["precio"]) is not None
+
+def iterar_viajes(url):
+    """
+    Generador de viajes: primero por HTTP y, si los resultados necesitan JavaScript, con Selenium
+    """
+    viajes = try_http("omega", url, parsear_viajes, is_valid=viaje_valido)
+    if viajes is None:
+        encontrados = False
+        for viaje in iterar_viajes_selenium(url):
+            encontrados = True
+            yield viaje
+        selenium_done("omega", encontrados)
+        return
+    metrics.incr("omega", "records", len(viajes))
+    yield from viajes
+
+def iterar_viajes_selenium(url):
+    """
+    Generador de viajes con Selenium: el navegador vuelve al pool antes de entregar el primer registro
     """
-    driver = configurar_selenium()
-    try:
-        driver.get(url)
-        time.sleep(10)  # Espera para que cargue el contenido dinámico
+    with obtener_pool().checkout() as driver:
+        install_network_tracker(driver)
+        with metrics.stage("omega", "get"):
+            driver.get(url)
+        # Espera a que el contenido dinámico deje de cambiar (máximo 10 s)
+        with metrics.stage("omega", "wait"):
+            wait_until_ready(driver, "div.resultContainer", timeout=10, label="omega")
 
         # Obtener el HTML después de que JavaScript haya cargado todo el contenido
         html = driver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
-
-        # Lista para almacenar todos los viajes
-        viajes = []
-
-        # Encontrar todos los contenedores de viajes
-        contenedores = soup.find_all("div", class_="container-lg border-bottom resultContainer d-flex flex-column justify-content-center")
-
-        for contenedor in contenedores:
-            # Extraer horario de salida
-            salida = contenedor.find("div", class_="time_and_city col d-flex flex-column justify-content-center align-items-center")
-            if salida:
-                hora_salida = salida.find("div").text.strip()  # Ejemplo: "01:30"
-                icono_salida = salida.find("svg", {"title": True})  # Buscar el ícono con el atributo title
-                periodo_salida = icono_salida["title"] if icono_salida else "No disponible"
-                hora_salida_am_pm = convertir_a_am_pm(hora_salida, periodo_salida)
-            else:
-                hora_salida_am_pm = "No disponible"
-
-            # Extraer terminal de salida
-            terminal_salida = salida.find("div", class_="font_12 text-secondary").text.strip() if salida else "No disponible"
-
-            # Extraer horario de llegada
-            llegada = contenedor.find_all("div", class_="time_and_city col d-flex flex-column justify-content-center align-items-center")[-1]
-            if llegada:
-                hora_llegada = llegada.find("div").text.strip()  # Ejemplo: "10:40"
-                icono_llegada = llegada.find("svg", {"title": True})  # Buscar el ícono con el atributo title
-                periodo_llegada = icono_llegada["title"] if icono_llegada else "No disponible"
-                hora_llegada_am_pm = convertir_a_am_pm(hora_llegada, periodo_llegada)
-                terminal_llegada = llegada.find("div", class_="font_12 text-secondary").text.strip()
-            else:
-                hora_llegada_am_pm = "No disponible"
-                terminal_llegada = "No disponible"
-
-            # Extraer tipo de servicio
-            tipo_servicio = contenedor.find("div", class_="col time_and_city text-center d-flex flex-column justify-content-center")
-            tipo_servicio = tipo_servicio.text.strip() if tipo_servicio else "No disponible"
-
-            # Extraer asientos disponibles
-            asientos = contenedor.find("div", class_="col time_and_city d-flex flex-column justify-content-center align-items-center max_width_150")
-            asientos = asientos.text.strip() if asientos else "No disponible"
-
-            # Extraer precio
-            precio = contenedor.find("div", class_="view_seats_button text-center")
-            precio = precio.text.strip() if precio else "No disponible"
-
-            # Crear diccionario con la información del viaje
-            viaje = {
-                'hora_salida_am_pm': hora_salida_am_pm,
-                'terminal_salida': terminal_salida,
-                'hora_llegada_am_pm': hora_llegada_am_pm,
-                'terminal_llegada': terminal_llegada,
-                'tipo_servicio': tipo_servicio,
-                'asientos': asientos,
-                'precio': precio
-            }
-            viajes.append(viaje)
-
-        return viajes
-
-    finally:
-        driver.quit()
+        metrics.incr("omega", "page_bytes", len(html))
+        record_page("omega", url, html)
+
+    with metrics.stage("omega", "parse"):
+        viajes = parsear_viajes(html)
+    metrics.incr("omega", "records", len(viajes))
+    yield from viajes
+
+def parsear_viajes(html, rapido=None):
+    """
+    Extrae los viajes del HTML de resultados (con lxml si está disponible, si no con BeautifulSoup)
+    """
+    rapido = PARSER_RAPIDO if rapido is None else rapido
+    if rapido and lxml_html is not None:
+        return parsear_viajes_lxml(html)
+    return parsear_viajes_bs4(html)
+
+def parsear_viajes_bs4(html):
+    """
+    Parser original: BeautifulSoup sobre toda la página
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Lista para almacenar todos los viajes
+    viajes = []
+
+    # Encontrar todos los contenedores de viajes
+    contenedores = soup.find_all("div", class_=CLASE_CONTENEDOR)
+
+    for contenedor in contenedores:
+        # Extraer horario de salida
+        salida = contenedor.find("div", class_=CLASE_HORARIO)
+        if salida:
+            hora_salida = salida.find("div").text.strip()  # Ejemplo: "01:30"
+            icono_salida = salida.find("svg", {"title": True})  # Buscar el ícono con el atributo title
+            periodo_salida = icono_salida["title"] if icono_salida else "No disponible"
+            hora_salida_am_pm = convertir_a_am_pm(hora_salida, periodo_salida)
+        else:
+            hora_salida_am_pm = "No disponible"
+
+        # Extraer terminal de salida
+        terminal_salida = salida.find("div", class_=CLASE_TERMINAL).text.strip() if salida else "No disponible"
+
+        # Extraer horario de llegada
+        llegada = contenedor.find_all("div", class_=CLASE_HORARIO)[-1]
+        if llegada:
+            hora_llegada = llegada.find("div").text.strip()  # Ejemplo: "10:40"
+            icono_llegada = llegada.find("svg", {"title": True})  # Buscar el ícono con el atributo title
+            periodo_llegada = icono_llegada["title"] if icono_llegada else "No disponible"
+            hora_llegada_am_pm = convertir_a_am_pm(hora_llegada, periodo_llegada)
+            terminal_llegada = llegada.find("div", class_=CLASE_TERMINAL).text.strip()
+        else:
+            hora_llegada_am_pm = "No disponible"
+            terminal_llegada = "No disponible"
+
+        # Extraer tipo de servicio
+        tipo_servicio = contenedor.find("div", class_=CLASE_TIPO_SERVICIO)
+        tipo_servicio = tipo_servicio.text.strip() if tipo_servicio else "No disponible"
+
+        # Extraer asientos disponibles
+        asientos = contenedor.find("div", class_=CLASE_ASIENTOS)
+        asientos = asientos.text.strip() if asientos else "No disponible"
+
+        # Extraer precio
+        precio = contenedor.find("div", class_=CLASE_PRECIO)
+        precio = precio.text.strip() if precio else "No disponible"
+
+        # Crear diccionario con la información del viaje
+        viaje = {
+            'hora_salida_am_pm': hora_salida_am_pm,
+            'terminal_salida': terminal_salida,
+            'hora_llegada_am_pm': hora_llegada_am_pm,
+            'terminal_llegada': terminal_llegada,
+            'tipo_servicio': tipo_servicio,
+            'asientos': asientos,
+            'precio': precio
+        }
+        viajes.append(viaje)
+
+    return viajes
+
+def _texto(elemento):
+    """
+    Texto completo de un elemento de lxml, sin espacios en los extremos
+    """
+    return elemento.text_content().strip()
+
+def _hora_y_terminal(bloque):
+    """
+    Hora (con am/pm según el ícono del periodo) y terminal de un bloque de salida o llegada
+    """
+    hora = periodo = terminal = None
+    for elemento in bloque.iterdescendants("div", "svg"):
+        if elemento.tag == "svg":
+            if periodo is None and elemento.get("title") is not None:
+                periodo = elemento.get("title")
+        else:
+            if hora is None:
+                hora = _texto(elemento)
+            if terminal is None and elemento.get("class") == CLASE_TERMINAL:
+                terminal = _texto(elemento)
+    hora_am_pm = convertir_a_am_pm(hora or "", periodo or "No disponible")
+    return hora_am_pm, terminal or "No disponible"
+
+def parsear_viajes_lxml(html):
+    """
+    Parser rápido: lxml, solo los contenedores de resultados y un recorrido por contenedor
+    """
+    arbol = lxml_html.fromstring(html)
+    viajes = []
+    for contenedor in arbol.xpath(f'//div[@class="{CLASE_CONTENEDOR}"]'):
+        horarios = []
+        campos = {}
+        for div in contenedor.iterdescendants("div"):
+            clase = div.get("class")
+            if clase == CLASE_HORARIO:
+                horarios.append(div)
+            elif clase in CAMPOS_POR_CLASE and CAMPOS_POR_CLASE[clase] not in campos:
+                campos[CAMPOS_POR_CLASE[clase]] = _texto(div)
+
+        if horarios:
+            hora_salida_am_pm, terminal_salida = _hora_y_terminal(horarios[0])
+            hora_llegada_am_pm, terminal_llegada = _hora_y_terminal(horarios[-1])
+        else:
+            hora_salida_am_pm = terminal_salida = hora_llegada_am_pm = terminal_llegada = "No disponible"
+
+        viajes.append({
+            'hora_salida_am_pm': hora_salida_am_pm,
+            'terminal_salida': terminal_salida,
+            'hora_llegada_am_pm': hora_llegada_am_pm,
+            'terminal_llegada': terminal_llegada,
+            'tipo_servicio': campos.get('tipo_servicio', "No disponible"),
+            'asientos': campos.get('asientos', "No disponible"),
+            'precio': campos.get('precio', "No disponible")
+        })
+    return viajes
 
 def main():
-    # URL proporcionada
-    url = "https://omega.redbus.co/searchbus?fromcityID=195236&tocityID=195201&fromcity=Term.%20BUCARAMANGA&tocity=Term.%20BOGOTA%20SALITRE&datePicker=2025-03-13"
+    url = construir_url("bucaramanga", "bogota", "2025-03-13")
 
     print("Buscando viajes disponibles...")
     viajes = obtener_info_viajes(url)
@@ -135,4 +303,5 @@ def main():
         print("No se encontraron viajes disponibles")
 
 if __name__ == "__main__":
-    main()
+    with profiling.from_argv("omega"):
+        main()
@@ -0,0 +1,168 @@
+"""
+Pipeline de registros con destinos (sinks) intercambiables.
+
+Los scrapers producen registros con generadores y los entregan con `put`;
+cada sink tiene su propia cola acotada y su hilo de escritura, así que el
+scraping no espera a las escrituras salvo cuando una cola se llena
+(contrapresión de un sink lento).
+
+Especificaciones de sink para la línea de comandos (`sink_from_spec`):
+    stdout
+    jsonl:ruta/archivo.jsonl
+    parquet:directorio     (columnar.ParquetSink, requiere pyarrow)
+    mongo:base/coleccion   (usa MONGO_URI)
+"""
+from dotenv import load_dotenv
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from mongo_writer import BulkWriter
+
+QUEUE_SIZE = 1000  # Registros pendientes por sink antes de frenar a los productores
+
+_STOP = object()
+
+
+class StdoutSink:
+    """Escribe cada registro como una línea JSON en la salida estándar"""
+
+    def write(self, record):
+        print(json.dumps(record, ensure_ascii=False, default=str))
+
+    def close(self):
+        sys.stdout.flush()
+
+
+class JsonlSink:
+    """Añade cada registro como una línea JSON al archivo `path`"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class MongoSink:
+    """Upserts por lotes en MongoDB a través de BulkWriter"""
+
+    def __init__(self, collection, key_func, client=None, **writer_kwargs):
+        self.client = client
+        self.writer = BulkWriter(collection, key_func, **writer_kwargs)
+        self.writer.ensure_index()
+
+    def write(self, record):
+        self.writer.add(record)
+
+    def close(self):
+        stats = self.writer.close()
+        logging.info(f'MongoDB: {stats}')
+        if self.client is not None:
+            self.client.close()
+
+
+def sink_from_spec(spec, key_func=None):
+    """Crear un sink a partir de 'stdout', 'jsonl:<ruta>', 'parquet:<dir>' o 'mongo:<base>/<colección>'"""
+    kind, _, target = spec.partition(':')
+    if kind == 'stdout':
+        return StdoutSink()
+    if kind == 'jsonl' and target:
+        return JsonlSink(target)
+    if kind == 'parquet' and target:
+        from columnar import ParquetSink
+
+        return ParquetSink(target)
+    if kind == 'mongo' and '/' in target:
+        from pymongo import MongoClient
+
+        if key_func is None:
+            raise ValueError('El sink de MongoDB necesita una función de clave')
+        load_dotenv()
+        database, collection = target.split('/', 1)
+        client = MongoClient(os.environ.get('MONGO_URI'))
+        return MongoSink(client[database][collection], key_func, client=client)
+    raise ValueError(f'Sink desconocido: {spec}')
+
+
+class Pipeline:
+    """Reparte cada registro a todos los sinks mediante colas acotadas"""
+
+    def __init__(self, sinks, queue_size=QUEUE_SIZE):
+        self.sinks = sinks
+        self.stats = {'records': 0, 'blocked_seconds': 0.0, 'sinks': {}}
+        self._lock = threading.Lock()
+        self._queues = []
+        self._threads = []
+        for index, sink in enumerate(sinks):
+            name = f'{index}-{type(sink).__name__}'
+            self.stats['sinks'][name] = {'written': 0, 'errors': 0}
+            sink_queue = queue.Queue(maxsize=queue_size)
+            thread = threading.Thread(target=self._drain, args=(sink, sink_queue, self.stats['sinks'][name]),
+                                      name=f'sink-{name}', daemon=True)
+            thread.start()
+            self._queues.append(sink_queue)
+            self._threads.append(thread)
+
+    def put(self, record):
+        """Entregar un registro; solo bloquea si la cola de algún sink está llena"""
+        blocked = 0.0
+        for sink_queue in self._queues:
+            try:
+                sink_queue.put_nowait(record)
+            except queue.Full:
+                started = time.monotonic()
+                sink_queue.put(record)
+                blocked += time.monotonic() - started
+        with self._lock:
+            self.stats['records'] += 1
+            self.stats['blocked_seconds'] += blocked
+
+    def feed(self, records):
+        """Consumir un generador de registros; devuelve cuántos se entregaron"""
+        count = 0
+        for record in records:
+            self.put(record)
+            count += 1
+        return count
+
+    def close(self):
+        """Esperar a que los sinks vacíen sus colas, cerrarlos y devolver las estadísticas"""
+        for sink_queue in self._queues:
+            sink_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        if self.stats['blocked_seconds'] > 1:
+            logging.warning(f"Los productores esperaron {self.stats['blocked_seconds']:.1f}s por sinks lentos")
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def _drain(sink, sink_queue, stats):
+        while True:
+            record = sink_queue.get()
+            if record is _STOP:
+                break
+            try:
+                sink.write(record)
+                stats['written'] += 1
+            except Exception as e:
+                stats['errors'] += 1
+                logging.error(f'Error escribiendo en {type(sink).__name__}: {e}')
+        try:
+            sink.close()
+        except Exception as e:
+            logging.error(f'Error cerrando {type(sink).__name__}: {e}')
@@ -0,0 +1,241 @@
+"""
+Perfilado opcional de los scrapers y del chatbot.
+
+Un `Profiler` combina cProfile (llamadas exactas del hilo que lo activa) con
+un muestreador de pilas de todos los hilos (tiempo de reloj). Al escribirlo
+deja en PROFILE_DIR:
+
+    <nombre>-<marca>.pstats     estadísticas de cProfile (pstats, snakeviz)
+    <nombre>-<marca>.collapsed  pilas plegadas para flamegraph.pl o speedscope
+    <nombre>-<marca>.txt        las funciones más costosas (top N)
+
+Formas de activarlo:
+    python omega.py --profile                    (también coopetran, avianca, air, chatbot)
+    python scheduler.py --job omega:bucaramanga:bogota --profile
+    python -m benchmarks.replay --provider omega --profile
+    PROFILE_STAGE=omega:parse python scheduler.py ...   (solo una etapa de metrics.stage)
+"""
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import atexit
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_STAGE = os.environ.get('PROFILE_STAGE')  # 'proveedor' o 'proveedor:etapa'
+TOP_N = int(os.environ.get('PROFILE_TOP', '25'))
+SAMPLE_INTERVAL = 0.005  # Segundos entre muestras de pilas
+MAX_DEPTH = 200
+
+
+class StackSampler:
+    """Muestreador de pilas de todos los hilos con sys._current_frames"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = self._labels[code] = f'{module}:{code.co_name}:{code.co_firstlineno}'
+        return label
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Líneas 'marco;marco;marco cuenta' ordenadas por número de muestras"""
+        return [f'{stack} {count}' for stack, count in self.stacks.most_common()]
+
+    def top(self, n=TOP_N):
+        """Funciones con más muestras propias (cima de la pila) e inclusivas"""
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]  # Sin el nombre del hilo
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        return own.most_common(n), inclusive.most_common(n)
+
+
+class Profiler:
+    """cProfile + muestreo de pilas; se puede activar varias veces y acumula"""
+
+    def __init__(self, name, interval=SAMPLE_INTERVAL):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval)
+        self.seconds = 0.0
+        self.calls = 0
+        self._owner = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        """Perfilar el bloque; si otro hilo ya está perfilando, el bloque corre sin perfilar"""
+        with self._lock:
+            if self._owner is not None:
+                busy = True
+            else:
+                busy = False
+                self._owner = threading.get_ident()
+        if busy:
+            yield
+            return
+
+        started = time.perf_counter()
+        self.sampler.start()
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+            self.sampler.stop()
+            self.seconds += time.perf_counter() - started
+            self.calls += 1
+            with self._lock:
+                self._owner = None
+
+    def report(self, top=TOP_N):
+        """Texto con el top N de cProfile (acumulado y propio) y del muestreo"""
+        out = io.StringIO()
+        out.write(f'Perfil {self.name}: {self.calls} ejecuciones, {self.seconds:.2f}s, '
+                  f'{self.sampler.samples} muestras\n\n')
+        try:
+            stats = pstats.Stats(self.profile, stream=out)
+        except TypeError:
+            out.write('cProfile no registró llamadas en este hilo\n')
+        else:
+            stats.strip_dirs()
+            out.write(f'== cProfile: top {top} por tiempo acumulado ==\n')
+            stats.sort_stats('cumulative').print_stats(top)
+            out.write(f'== cProfile: top {top} por tiempo propio ==\n')
+            stats.sort_stats('tottime').print_stats(top)
+
+        own, inclusive = self.sampler.top(top)
+        total = max(sum(self.sampler.stacks.values()), 1)
+        out.write(f'== Muestreo (todos los hilos): top {top} propio ==\n')
+        for frame, count in own:
+            out.write(f'{count * 100 / total:6.1f}%  {frame}\n')
+        out.write(f'\n== Muestreo (todos los hilos): top {top} inclusivo ==\n')
+        for frame, count in inclusive:
+            out.write(f'{count * 100 / total:6.1f}%  {frame}\n')
+        return out.getvalue()
+
+    def write(self, directory=None, top=TOP_N):
+        """Escribir .pstats, .collapsed y .txt; devuelve las rutas"""
+        directory = directory or PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f'{self.name}-{datetime.now():%Y%m%dT%H%M%S}')
+        paths = {'pstats': f'{base}.pstats', 'collapsed': f'{base}.collapsed', 'report': f'{base}.txt'}
+
+        self.profile.dump_stats(paths['pstats'])
+        with open(paths['collapsed'], 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.sampler.collapsed()) + '\n')
+        report = self.report(top)
+        with open(paths['report'], 'w', encoding='utf-8') as f:
+            f.write(report)
+
+        print(f'Perfil {self.name} ({self.seconds:.2f}s): {base}.txt, .collapsed y .pstats')
+        return paths
+
+
+@contextmanager
+def profiled(name, directory=None, top=TOP_N):
+    """Perfilar un bloque y escribir los resultados al salir"""
+    profiler = Profiler(name)
+    try:
+        with profiler.active():
+            yield profiler
+    finally:
+        profiler.write(directory, top)
+
+
+_accumulators = {}
+_accumulators_lock = threading.Lock()
+
+
+def accumulator(name):
+    """Profiler compartido que acumula varias ejecuciones y se escribe al terminar el proceso"""
+    with _accumulators_lock:
+        profiler = _accumulators.get(name)
+        if profiler is None:
+            profiler = _accumulators[name] = Profiler(name)
+        return profiler
+
+
+@atexit.register
+def write_accumulated():
+    """Escribir los perfiles acumulados que tengan al menos una ejecución"""
+    with _accumulators_lock:
+        profilers = list(_accumulators.values())
+    for profiler in profilers:
+        if profiler.calls:
+            profiler.write()
+
+
+def wrap(func, name):
+    """Versión de `func` que acumula cada llamada en el perfil `name`"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with accumulator(name).active():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def argv_flag(flag='--profile'):
+    """Quitar `flag` de sys.argv; devuelve si estaba presente"""
+    if flag in sys.argv:
+        sys.argv.remove(flag)
+        return True
+    return False
+
+
+def from_argv(name):
+    """`profiled(name)` si se pasó --profile en la línea de comandos; si no, un contexto vacío"""
+    return profiled(name) if argv_flag() else nullcontext()
+
+
+def stage_profiler(provider, stage):
+    """Contexto que perfila la etapa si coincide con PROFILE_STAGE ('proveedor' o 'proveedor:etapa')"""
+    if not PROFILE_STAGE or PROFILE_STAGE not in (provider, f'{provider}:{stage}'):
+        return nullcontext()
+    return accumulator(f'{provider}-{stage}').active()
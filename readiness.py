@@ -0,0 +1,133 @@
+"""
+Esperas basadas en señales reales de la página en lugar de pausas fijas.
+
+Un script inyectado cuenta las peticiones fetch/XHR en curso y registra la
+última mutación del DOM. `wait_until_ready` sondea ese estado y termina en
+cuanto la página está quieta (sin peticiones pendientes, sin mutaciones
+recientes y con el número de resultados estable), o al llegar al tope.
+"""
+from selenium.common.exceptions import JavascriptException
+from selenium.webdriver.common.by import By
+import logging
+import time
+import weakref
+
+TRACKER_JS = """
+(function () {
+  if (window.__wayraTracker) return;
+  var t = window.__wayraTracker = {pending: 0, lastMutation: performance.now()};
+  if (window.fetch) {
+    var originalFetch = window.fetch;
+    window.fetch = function () {
+      t.pending++;
+      return originalFetch.apply(this, arguments).finally(function () { t.pending--; });
+    };
+  }
+  var originalSend = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    t.pending++;
+    this.addEventListener('loadend', function () { t.pending--; }, {once: true});
+    return originalSend.apply(this, arguments);
+  };
+  var observe = function () {
+    new MutationObserver(function () { t.lastMutation = performance.now(); })
+      .observe(document.documentElement, {childList: true, subtree: true});
+  };
+  if (document.documentElement) observe();
+  else document.addEventListener('DOMContentLoaded', observe);
+})();
+"""
+
+STATE_JS = """
+var t = window.__wayraTracker;
+var selector = arguments[0];
+return {
+  tracker: !!t,
+  count: selector ? document.querySelectorAll(selector).length : 0,
+  pending: t ? Math.max(t.pending, 0) : 0,
+  idleMs: t ? performance.now() - t.lastMutation : 0,
+  readyState: document.readyState
+};
+"""
+
+_tracked_drivers = weakref.WeakSet()
+
+
+def install_network_tracker(driver):
+    """Inyectar el contador de peticiones en cada documento nuevo (llamar antes de driver.get)"""
+    if driver in _tracked_drivers:
+        return
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': TRACKER_JS})
+    _tracked_drivers.add(driver)
+
+
+def wait_until_ready(driver, selector=None, timeout=10, min_count=1, quiet=0.5, poll=0.2, label=None):
+    """
+    Esperar a que la página esté lista, con `timeout` segundos como tope.
+
+    Lista significa: documento cargado, sin fetch/XHR pendientes, sin mutaciones
+    del DOM durante `quiet` segundos y, si hay `selector`, al menos `min_count`
+    elementos cuyo número no ha cambiado durante `quiet` segundos.
+    Devuelve el número de elementos que coinciden con `selector`.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    last_count = None
+    stable_since = started
+    state = None
+
+    while True:
+        ready = False
+        try:
+            state = driver.execute_script(STATE_JS, selector)
+        except JavascriptException:
+            state = None  # La página está navegando; se vuelve a consultar
+
+        now = time.monotonic()
+        if state is not None:
+            if not state['tracker']:
+                # Página cargada antes de instalar el contador: se inyecta ahora
+                driver.execute_script(TRACKER_JS)
+            if state['count'] != last_count:
+                last_count = state['count']
+                stable_since = now
+            ready = (
+                state['readyState'] == 'complete'
+                and state['pending'] == 0
+                and state['idleMs'] >= quiet * 1000
+                and now - stable_since >= quiet
+                and (selector is None or state['count'] >= min_count)
+            )
+        if ready or now >= deadline:
+            break
+        time.sleep(poll)
+
+    count = last_count or 0
+    logging.info(
+        f"Espera '{label or selector or 'página'}': "
+        f"{'lista' if ready else 'tope alcanzado'} en {now - started:.2f}s de {timeout}s "
+        f"(elementos: {count}, peticiones pendientes: {state['pending'] if state else '?'})"
+    )
+    return count
+
+
+def wait_for_count(driver, selector, min_count, timeout=5, poll=0.1, label=None):
+    """
+    Esperar a que haya al menos `min_count` elementos con `selector`, sin esperar
+    a que la página se quede quieta. Devuelve el número de elementos al terminar.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    while True:
+        count = len(driver.find_elements(By.CSS_SELECTOR, selector))
+        now = time.monotonic()
+        if count >= min_count or now >= deadline:
+            break
+        time.sleep(poll)
+
+    logging.info(
+        f"Espera '{label or selector}': "
+        f"{'lista' if count >= min_count else 'tope alcanzado'} en {now - started:.2f}s de {timeout}s "
+        f"(elementos: {count} de {min_count})"
+    )
+    return count
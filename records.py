@@ -0,0 +1,211 @@
+"""
+Modelo tipado y compacto de los registros extraídos.
+
+Los scrapers entregan diccionarios de textos ("$120.000", "01:30 pm",
+"No disponible"). Aquí se convierten una sola vez a tuplas con nombre
+(sin __dict__ por instancia): precios en COP enteros, horas en minutos desde
+la medianoche y None en lugar de los centinelas. Los textos repetidos
+(terminales, tipo de servicio) se internan para compartir una sola copia.
+
+    viajes = normalizar_lote(omega.obtener_info_viajes(url), 'omega')
+    baratos = [v for v in viajes if v.precio is not None and v.precio < 100000]
+"""
+from collections import namedtuple
+from functools import lru_cache
+import re
+import sys
+
+NO_DISPONIBLE = "No disponible"
+
+Viaje = namedtuple('Viaje', [
+    'proveedor', 'origen', 'destino', 'fecha',
+    'salida_min', 'llegada_min', 'duracion_min',
+    'terminal_salida', 'terminal_llegada', 'servicio', 'asientos', 'precio',
+])
+Vuelo = namedtuple('Vuelo', [
+    'proveedor', 'origen', 'destino', 'fecha',
+    'salida_min', 'llegada_min', 'duracion_min',
+    'servicio', 'precio', 'tarifas',  # tarifas: tupla de (familia, precio)
+])
+Alojamiento = namedtuple('Alojamiento', ['id', 'nombre', 'ciudad', 'precio', 'rating', 'url'])
+
+# Miles con punto o espacio (siempre el mismo separador y grupos de tres cifras), para no
+# pegar el precio con el número que lo sigue ('$ 95.000 2 asientos')
+_NUMERO = re.compile(r'\d{1,3}([.\s])\d{3}(?:\1\d{3})*(?:,\d{1,2})?|\d+(?:,\d{1,2})?')
+_DECIMAL = re.compile(r'\d+(?:[.,]\d+)?')
+_HORA = re.compile(r'(\d{1,2}):(\d{2})\s*([ap])?', re.IGNORECASE)
+_DURACION = re.compile(r'(\d+)\s*(h|hora|m|min)', re.IGNORECASE)
+_CENTAVOS = re.compile(r',\d{1,2}$')
+_NO_DIGITOS = re.compile(r'\D')
+_LISTING = re.compile(r'/rooms/(\d+)')
+
+
+def texto(valor):
+    """None para los centinelas 'No disponible' y las cadenas vacías"""
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return None if not valor or valor == NO_DISPONIBLE else valor
+
+
+def categoria(valor):
+    """Como `texto`, pero internado: los valores repetidos comparten una sola cadena"""
+    valor = texto(valor)
+    return sys.intern(valor) if valor is not None else None
+
+
+@lru_cache(maxsize=8192)
+def _cop_texto(valor):
+    valor = texto(valor)
+    numero = _NUMERO.search(valor) if valor else None
+    if not numero:
+        return None
+    # Formato colombiano: punto de miles y coma decimal (los centavos se descartan)
+    digitos = _NO_DIGITOS.sub('', _CENTAVOS.sub('', numero.group().strip()))
+    return int(digitos) if digitos else None
+
+
+def cop(valor):
+    """
+    '$120.000', 'COP 250.900,00' o 95000.0 -> pesos enteros
+
+    >>> cop('$120.000'), cop('COP 250.900,00'), cop('$ 1 250 000'), cop(95000.0)
+    (120000, 250900, 1250000, 95000)
+    >>> cop('$ 95.000 2 asientos'), cop('Desde $ 85.000\\n12 sillas'), cop('$180.000 por noche, 3 noches')
+    (95000, 85000, 180000)
+    >>> cop('$ 85.000 120 km'), cop('No disponible')
+    (85000, None)
+    """
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return int(round(valor))
+    return _cop_texto(valor) if isinstance(valor, str) else None
+
+
+def decimal(valor):
+    """'4,85 de 5' o '4.85' -> 4.85"""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    numero = _DECIMAL.search(texto(valor) or '')
+    return float(numero.group().replace(',', '.')) if numero else None
+
+
+def entero(valor):
+    """Primer número entero de un texto ('23 sillas disponibles' -> 23)"""
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    numero = re.search(r'\d+', texto(valor) or '')
+    return int(numero.group()) if numero else None
+
+
+@lru_cache(maxsize=2048)
+def _minutos_texto(valor):
+    hora = _HORA.search(valor)
+    if not hora:
+        return None
+    horas, minutos, periodo = int(hora.group(1)), int(hora.group(2)), hora.group(3)
+    if periodo:
+        horas = horas % 12 + (12 if periodo.lower() == 'p' else 0)
+    return horas * 60 + minutos if horas < 24 and minutos < 60 else None
+
+
+def minutos(valor):
+    """'01:30 pm', '1:30 PM' o '13:05' -> minutos desde la medianoche"""
+    return _minutos_texto(valor) if isinstance(valor, str) else None
+
+
+def duracion(valor, salida=None, llegada=None):
+    """'1h 5m', 'PT1H5M' o '2 horas y 30 minutos' -> minutos; si no, la diferencia entre horas"""
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    total = None
+    for cantidad, unidad in _DURACION.findall(texto(valor) or ''):
+        total = (total or 0) + int(cantidad) * (60 if unidad.lower().startswith('h') else 1)
+    if total is None and salida is not None and llegada is not None:
+        # Si el viaje cruza la medianoche la resta negativa se corrige con el módulo
+        total = (llegada - salida) % (24 * 60)
+    return total
+
+
+def cops(valores):
+    """Normalizar una columna de precios (los textos repetidos salen de la caché)"""
+    return [cop(valor) for valor in valores]
+
+
+def minutos_lote(valores):
+    """Normalizar una columna de horas"""
+    return [minutos(valor) for valor in valores]
+
+
+def viaje(record, proveedor=None):
+    """Viaje de bus de Omega o Copetran"""
+    salida = minutos(record.get('hora_salida_am_pm') or record.get('horario_salida'))
+    llegada = minutos(record.get('hora_llegada_am_pm') or record.get('horario_llegada'))
+    return Viaje(
+        proveedor=record.get('proveedor') or proveedor,
+        origen=categoria(record.get('origen')),
+        destino=categoria(record.get('destino')),
+        fecha=record.get('fecha'),
+        salida_min=salida,
+        llegada_min=llegada,
+        duracion_min=duracion(record.get('duracion_minutos', record.get('duracion')), salida, llegada),
+        terminal_salida=categoria(record.get('terminal_salida')),
+        terminal_llegada=categoria(record.get('terminal_llegada')),
+        servicio=categoria(record.get('tipo_servicio') or record.get('tipo_bus')),
+        asientos=entero(record.get('asientos') or record.get('sillas_disponibles')),
+        precio=cop(record.get('precio')),
+    )
+
+
+def vuelo(record, proveedor=None):
+    """Vuelo de Avianca (del DOM o de la respuesta de disponibilidad)"""
+    salida = minutos(record.get('hora_salida'))
+    llegada = minutos(record.get('hora_llegada'))
+    tarifas = record.get('tarifas')
+    return Vuelo(
+        proveedor=record.get('proveedor') or proveedor,
+        origen=categoria(record.get('origen')),
+        destino=categoria(record.get('destino')),
+        fecha=record.get('fecha'),
+        salida_min=salida,
+        llegada_min=llegada,
+        duracion_min=duracion(record.get('duracion'), salida, llegada),
+        servicio=categoria(record.get('tipo_vuelo')),
+        precio=cop(record.get('precio')),
+        tarifas=tuple((sys.intern(nombre), cop(precio)) for nombre, precio in tarifas.items()) if tarifas else None,
+    )
+
+
+def alojamiento(record, proveedor=None):
+    """Alojamiento de Airbnb (documento de air.construir_hotel)"""
+    url = record.get('url')
+    listing = _LISTING.search(url or '')
+    return Alojamiento(
+        id=listing.group(1) if listing else None,
+        nombre=texto(record.get('nombre')),
+        ciudad=categoria(record.get('ciudad')),
+        precio=cop(record.get('precio')),
+        rating=decimal(record.get('rating')),
+        url=url,
+    )
+
+
+# Proveedor -> convertidor de diccionario a registro tipado
+CONVERTIDORES = {
+    'omega': viaje,
+    'coopetran': viaje,
+    'avianca': vuelo,
+    'airbnb': alojamiento,
+}
+
+
+def normalizar(record, proveedor=None):
+    """Registro tipado de un diccionario; `proveedor` se usa si el registro no lo trae"""
+    proveedor = record.get('proveedor') or proveedor
+    if proveedor not in CONVERTIDORES:
+        raise ValueError(f'Proveedor desconocido: {proveedor}')
+    return CONVERTIDORES[proveedor](record, proveedor)
+
+
+def normalizar_lote(records, proveedor=None):
+    """Lista de registros tipados de un iterable de diccionarios"""
+    return [normalizar(record, proveedor) for record in records]
@@ -0,0 +1,179 @@
+"""
+Servidor HTTP local que reproduce las páginas y respuestas XHR grabadas.
+
+Sirve el corpus de fixtures (ver fixtures.py) bajo /<proveedor>/..., con
+latencia y jitter configurables, para medir el camino completo de Selenium
+(arranque del driver, driver.get, esperas, clics) sin acceso a la red.
+
+Uso:
+    python replay_server.py --fixtures fixtures --port 8765 --latency 0.3 --jitter 0.1
+
+y ejecutar los scrapers con las variables que imprime, por ejemplo
+OMEGA_BASE_URL=http://127.0.0.1:8765/omega.
+
+Las páginas grabadas ya están renderizadas, así que por defecto se sirven sin
+sus <script>. Si el proveedor tiene respuestas XHR grabadas, se inyecta un
+script que las vuelve a pedir al servidor para que la captura por CDP las vea.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, unquote
+from collections import defaultdict
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from fixtures import DEFAULT_DIR, load_fixtures, load_responses
+
+PROVIDERS = ('airbnb', 'avianca', 'coopetran', 'omega')
+
+# Variable de entorno con la que cada scraper toma su URL base
+BASE_URL_VARS = {
+    'airbnb': 'AIRBNB_BASE_URL',
+    'avianca': 'AVIANCA_BASE_URL',
+    'coopetran': 'COOPETRAN_BASE_URL',
+    'omega': 'OMEGA_BASE_URL',
+}
+
+SCRIPT_PATTERN = re.compile(r'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+
+XHR_REPLAY_JS = """<script>
+(function () {
+  %s.forEach(function (url) { fetch(url, {headers: {'Accept': 'application/json'}}).catch(function () {}); });
+})();
+</script>"""
+
+
+def _route(url):
+    """Ruta (sin codificar) y query de una URL grabada"""
+    parts = urlsplit(url or '')
+    return unquote(parts.path) or '/', parts.query
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Servidor de réplica sobre un directorio de fixtures"""
+
+    daemon_threads = True
+
+    def __init__(self, address, fixtures_dir=DEFAULT_DIR, latency=0.0, jitter=0.0, strip_scripts=True):
+        super().__init__(address, ReplayHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.strip_scripts = strip_scripts
+        self.pages = defaultdict(list)  # (proveedor, ruta) -> [(query, html)]
+        self.responses = {}  # (proveedor, ruta) -> [(query, content_type, body)]
+        self.xhr_urls = defaultdict(list)  # proveedor -> URLs locales de sus XHR grabadas
+
+        for provider in PROVIDERS:
+            for fixture in load_fixtures(provider, fixtures_dir):
+                path, query = _route(fixture.url)
+                self.pages[(provider, path)].append((query, fixture.html))
+            for response in load_responses(provider, fixtures_dir):
+                path, query = _route(response.url)
+                self.responses.setdefault((provider, path), []).append(
+                    (query, response.content_type or 'application/octet-stream', response.body))
+                self.xhr_urls[provider].append(f"/{provider}{path}" + (f"?{query}" if query else ''))
+
+        logging.info(f'Réplica cargada: {sum(len(v) for v in self.pages.values())} páginas, '
+                     f'{sum(len(v) for v in self.responses.values())} respuestas XHR')
+
+    def delay(self):
+        """Esperar la latencia configurada con jitter uniforme"""
+        seconds = self.latency + random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def find(self, entries, query):
+        """Entrada con la misma query o, si no hay, la última grabada para esa ruta"""
+        for entry in entries:
+            if entry[0] == query:
+                return entry
+        return entries[-1]
+
+    def page(self, provider, path, query):
+        entries = self.pages.get((provider, path))
+        if not entries:
+            return None
+        html = self.find(entries, query)[1]
+        if self.strip_scripts:
+            html = SCRIPT_PATTERN.sub('', html)
+            if self.xhr_urls[provider]:
+                script = XHR_REPLAY_JS % json.dumps(self.xhr_urls[provider])
+                html = html.replace('</body>', script + '</body>', 1) if '</body>' in html else html + script
+        return html.encode('utf-8')
+
+    def response(self, provider, path, query):
+        entries = self.responses.get((provider, path))
+        if not entries:
+            return None
+        _, content_type, body = self.find(entries, query)
+        return content_type, body
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    server_version = 'WayraReplay/1.0'
+
+    def do_GET(self):
+        self.server.delay()
+        parts = urlsplit(self.path)
+        provider, _, rest = unquote(parts.path).lstrip('/').partition('/')
+        path = '/' + rest
+
+        response = self.server.response(provider, path, parts.query)
+        if response is not None:
+            self._send(200, response[0], response[1])
+            return
+
+        page = self.server.page(provider, path, parts.query)
+        if page is not None:
+            self._send(200, 'text/html; charset=utf-8', page)
+            return
+
+        self._send(404, 'text/plain; charset=utf-8', b'Sin fixture para esta ruta')
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f'{self.address_string()} - {format % args}')
+
+
+def start_server(fixtures_dir=DEFAULT_DIR, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, strip_scripts=True):
+    """Arrancar el servidor en un hilo; devuelve (servidor, {proveedor: URL base})"""
+    server = ReplayServer((host, port), fixtures_dir, latency, jitter, strip_scripts)
+    threading.Thread(target=server.serve_forever, name='replay-server', daemon=True).start()
+    origin = f'http://{host}:{server.server_address[1]}'
+    return server, {provider: f'{origin}/{provider}' for provider in PROVIDERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de réplica de los proveedores')
+    parser.add_argument('--fixtures', default=DEFAULT_DIR)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Segundos añadidos a cada respuesta')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variación uniforme (±s) de la latencia')
+    parser.add_argument('--keep-scripts', action='store_true', help='Servir las páginas con sus <script>')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server, base_urls = start_server(args.fixtures, args.host, args.port, args.latency, args.jitter,
+                                     strip_scripts=not args.keep_scripts)
+    for provider, url in base_urls.items():
+        print(f'export {BASE_URL_VARS[provider]}={url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Perfiles de bloqueo de recursos para Chrome headless.
+
+Cada proveedor tiene un perfil con los recursos que no necesita (imágenes,
+media, fuentes, rastreadores y, donde solo se lee el HTML, hojas de estilo).
+El bloqueo se aplica con preferencias de Chrome y con `Network.setBlockedURLs`
+por CDP. Se desactiva con BLOCK_RESOURCES=0.
+
+Para comparar tiempo de carga y bytes con y sin bloqueo:
+    python resource_blocking.py omega --runs 3
+"""
+from datetime import date, timedelta
+import argparse
+import copy
+import logging
+import os
+import time
+
+ENABLED = os.environ.get('BLOCK_RESOURCES', '1') != '0'
+
+IMAGES = ['*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*']
+MEDIA = ['*.mp4*', '*.webm*', '*.mp3*', '*.m4a*', '*.ogg*']
+FONTS = ['*.woff*', '*.ttf*', '*.otf*', '*.eot*', '*fonts.googleapis.com*', '*fonts.gstatic.com*']
+STYLES = ['*.css*']
+TRACKERS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*adservice.google.*', '*facebook.net*',
+    '*facebook.com/tr*', '*connect.facebook.*', '*hotjar.com*', '*clarity.ms*',
+    '*nr-data.net*', '*newrelic.com*', '*criteo.*', '*taboola.com*',
+    '*bat.bing.com*', '*analytics.tiktok.com*', '*quantserve.com*', '*scorecardresearch.com*',
+]
+
+# Avianca y Airbnb necesitan los estilos: sus esperas y el innerText dependen del layout.
+# Omega y Copetran se parsean desde page_source, así que también se bloquea el CSS.
+PROFILES = {
+    'airbnb': IMAGES + MEDIA + FONTS + TRACKERS,
+    'avianca': IMAGES + MEDIA + FONTS + TRACKERS,
+    'omega': IMAGES + MEDIA + FONTS + STYLES + TRACKERS,
+    'coopetran': IMAGES + MEDIA + FONTS + STYLES + TRACKERS,
+}
+
+CHROME_PREFS = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_setting_values.notifications': 2,
+    'profile.default_content_setting_values.geolocation': 2,
+}
+
+METRICS_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = nav ? nav.transferSize : 0;
+resources.forEach(function (r) { bytes += r.transferSize; });
+return {
+  load_ms: nav ? nav.loadEventEnd - nav.startTime : null,
+  dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd - nav.startTime : null,
+  bytes: bytes,
+  resources: resources.length
+};
+"""
+
+
+def with_profile(options, provider, enabled=None):
+    """Copia de `options` con las preferencias de bloqueo del proveedor"""
+    enabled = ENABLED if enabled is None else enabled
+    options = copy.deepcopy(options)
+    if enabled and provider in PROFILES:
+        prefs = dict(options.experimental_options.get('prefs', {}), **CHROME_PREFS)
+        options.add_experimental_option('prefs', prefs)
+    return options
+
+
+def install_blocking(driver, provider, enabled=None):
+    """Activar el bloqueo de URLs por CDP en un navegador recién creado"""
+    enabled = ENABLED if enabled is None else enabled
+    # Buffer de Resource Timing amplio para que METRICS_JS cuente todos los recursos
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+        'source': 'performance.setResourceTimingBufferSize(5000);'
+    })
+    if not enabled or provider not in PROFILES:
+        return
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': PROFILES[provider]})
+
+
+def page_metrics(driver):
+    """Tiempo de carga y bytes transferidos de la página actual (Navigation/Resource Timing)"""
+    return driver.execute_script(METRICS_JS)
+
+
+def compare(factory, url, runs=3):
+    """Cargar `url` con y sin bloqueo en navegadores nuevos y devolver las medias de cada modo"""
+    summary = {}
+    for enabled in (False, True):
+        samples = []
+        for _ in range(runs):
+            driver = factory(enabled)
+            try:
+                started = time.monotonic()
+                driver.get(url)
+                metrics = page_metrics(driver)
+                metrics['get_seconds'] = time.monotonic() - started
+                samples.append(metrics)
+            finally:
+                driver.quit()
+        mode = 'con bloqueo' if enabled else 'sin bloqueo'
+        summary[mode] = {
+            key: sum(sample[key] or 0 for sample in samples) / len(samples)
+            for key in ('get_seconds', 'load_ms', 'bytes', 'resources')
+        }
+        logging.info(f'{mode}: {summary[mode]}')
+    return summary
+
+
+def main():
+    import air
+    import avianca
+    import coopetran
+    import omega
+
+    fecha = (date.today() + timedelta(days=7)).isoformat()
+    providers = {
+        'airbnb': (air.configurar_selenium, air.URL),
+        'avianca': (avianca.setup_driver, avianca.build_url('BOG', 'BGA', fecha)),
+        'omega': (omega.configurar_selenium, omega.construir_url('bucaramanga', 'bogota', fecha)),
+        'coopetran': (coopetran.configurar_selenium, coopetran.construir_url('bogota', 'bucaramanga', fecha)),
+    }
+
+    parser = argparse.ArgumentParser(description='Comparar carga de página con y sin bloqueo de recursos')
+    parser.add_argument('provider', choices=sorted(providers))
+    parser.add_argument('--url', help='URL a cargar (por defecto una búsqueda de ejemplo del proveedor)')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    factory, default_url = providers[args.provider]
+    summary = compare(factory, args.url or default_url, args.runs)
+
+    sin, con = summary['sin bloqueo'], summary['con bloqueo']
+    print(f"Tiempo de driver.get: {sin['get_seconds']:.2f}s -> {con['get_seconds']:.2f}s")
+    print(f"Bytes transferidos: {sin['bytes'] / 1024:.0f} KB -> {con['bytes'] / 1024:.0f} KB")
+    print(f"Recursos cargados: {sin['resources']:.0f} -> {con['resources']:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Planificador de búsquedas multi-ruta y multi-fecha.
+
+Recibe trabajos (proveedor, origen, destino, fecha), construye la URL de cada
+proveedor y los ejecuta en hilos con concurrencia acotada por proveedor,
+reportando el ritmo en trabajos por minuto. Con `--sink` los registros se
+entregan a un Pipeline (stdout, JSONL, Parquet o MongoDB) a medida que se extraen.
+
+Ejemplo:
+    python scheduler.py --job omega:bucaramanga:bogota --job avianca:BOG:BGA \
+        --start 2025-05-01 --days 7 --concurrency omega=3 --sink jsonl:viajes.jsonl
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, namedtuple, defaultdict
+from contextlib import nullcontext
+from datetime import date, timedelta
+import argparse
+import logging
+import json
+import time
+
+from pipeline import Pipeline, sink_from_spec
+import http_fetch
+import metrics
+import profiling
+import avianca
+import coopetran
+import omega
+
+Job = namedtuple('Job', ['provider', 'origin', 'destination', 'date'])
+# `records` queda vacío cuando los registros se entregan a un Pipeline; `count` siempre se llena.
+# `fetch` es la ruta que sirvió el trabajo ('http' o 'selenium'; None si el proveedor solo usa Selenium)
+JobResult = namedtuple('JobResult', ['job', 'url', 'count', 'records', 'error', 'seconds', 'fetch'])
+
+# Proveedor -> (constructor de URL, generador de registros, pool de navegadores)
+PROVIDERS = {
+    'omega': (omega.construir_url, omega.iterar_viajes, omega.obtener_pool),
+    'coopetran': (coopetran.construir_url, coopetran.iterar_viajes, coopetran.obtener_pool),
+    'avianca': (avianca.build_url, avianca.iter_flights, avianca.get_driver_pool),
+}
+
+# Campos que identifican un mismo viaje dentro de una búsqueda (clave de upsert en MongoDB)
+KEY_FIELDS = {
+    'omega': ('hora_salida_am_pm', 'terminal_salida', 'tipo_servicio'),
+    'coopetran': ('horario_salida', 'terminal_salida', 'tipo_bus'),
+    'avianca': ('hora_salida', 'hora_llegada', 'tipo_vuelo'),
+}
+
+DEFAULT_CONCURRENCY = 2
+
+
+def expand_jobs(provider, routes, start, days=1):
+    """Generar un trabajo por ruta (origen, destino) y por cada día desde `start`"""
+    if provider not in PROVIDERS:
+        raise ValueError(f'Proveedor desconocido: {provider}')
+    start = date.fromisoformat(str(start))
+    return [
+        Job(provider, origin, destination, (start + timedelta(days=offset)).isoformat())
+        for offset in range(days)
+        for origin, destination in routes
+    ]
+
+
+def jobs_per_minute(count, seconds):
+    """Ritmo de trabajos completados por minuto"""
+    return count * 60 / seconds if seconds > 0 else 0.0
+
+
+def record_key(record):
+    """Clave estable de un registro etiquetado por `tag_record`"""
+    fields = KEY_FIELDS.get(record['proveedor'], ())
+    parts = [record['proveedor'], record['origen'], record['destino'], record['fecha']]
+    parts.extend(str(record.get(field)) for field in fields)
+    return ':'.join(parts)
+
+
+def tag_record(job, record):
+    """Añadir proveedor, ruta y fecha al registro para que los sinks puedan mezclar trabajos"""
+    return dict(record, proveedor=job.provider, origen=job.origin, destino=job.destination, fecha=job.date)
+
+
+def run_job(job, pipeline=None):
+    """Ejecutar un trabajo y devolver su resultado (los errores no detienen el lote)"""
+    build_url, scrape, _ = PROVIDERS[job.provider]
+    started = time.monotonic()
+    metrics.incr(job.provider, 'jobs')
+    url = None
+    count = 0
+    records = []
+    http_fetch.reset_path()
+    try:
+        url = build_url(job.origin, job.destination, job.date)
+        for record in scrape(url):
+            record = tag_record(job, record)
+            if pipeline is None:
+                records.append(record)
+            else:
+                pipeline.put(record)
+            count += 1
+        return JobResult(job, url, count, records, None, time.monotonic() - started, http_fetch.last_path())
+    except Exception as e:
+        logging.error(f'Error en el trabajo {job}: {e}')
+        metrics.error(job.provider, 'job')
+        return JobResult(job, url, count, records, str(e), time.monotonic() - started, http_fetch.last_path())
+
+
+def summarize(results, seconds):
+    """Resumen del lote por proveedor, con trabajos/minuto sobre el tiempo total"""
+    by_provider = defaultdict(list)
+    for result in results:
+        by_provider[result.job.provider].append(result)
+
+    summary = {
+        'jobs': len(results),
+        'seconds': round(seconds, 2),
+        'jobs_per_minute': round(jobs_per_minute(len(results), seconds), 2),
+        'providers': {},
+    }
+    for provider, provider_results in by_provider.items():
+        summary['providers'][provider] = {
+            'jobs': len(provider_results),
+            'errors': sum(1 for r in provider_results if r.error),
+            'records': sum(r.count for r in provider_results),
+            'avg_job_seconds': round(sum(r.seconds for r in provider_results) / len(provider_results), 2),
+            'jobs_per_minute': round(jobs_per_minute(len(provider_results), seconds), 2),
+        }
+        fetch = Counter(r.fetch for r in provider_results if r.fetch)
+        if fetch:
+            summary['providers'][provider]['fetch'] = dict(fetch)
+    return summary
+
+
+def run_jobs(jobs, concurrency=None, pipeline=None):
+    """
+    Ejecutar los trabajos con un pool de hilos por proveedor; devuelve (resultados, resumen).
+    Con `pipeline` los registros se entregan a sus sinks en lugar de acumularse en los resultados.
+    """
+    concurrency = concurrency or {}
+    by_provider = defaultdict(list)
+    for job in jobs:
+        if job.provider not in PROVIDERS:
+            raise ValueError(f'Proveedor desconocido: {job.provider}')
+        by_provider[job.provider].append(job)
+
+    started = time.monotonic()
+    executors = []
+    futures = []
+    for provider, provider_jobs in by_provider.items():
+        workers = concurrency.get(provider, DEFAULT_CONCURRENCY)
+        # Un navegador caliente por hilo para que nadie espere en el pool
+        pool = PROVIDERS[provider][2]()
+        pool.size = max(pool.size, workers)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'crawl-{provider}')
+        executors.append(executor)
+        futures.extend(executor.submit(run_job, job, pipeline) for job in provider_jobs)
+
+    results = []
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            elapsed = time.monotonic() - started
+            estado = f'error: {result.error}' if result.error else f'{result.count} registros'
+            if result.fetch:
+                estado += f' ({result.fetch})'
+            logging.info(
+                f'[{done}/{len(futures)}] {result.job.provider} {result.job.origin}->{result.job.destination} '
+                f'{result.job.date}: {estado} en {result.seconds:.1f}s '
+                f'({jobs_per_minute(done, elapsed):.1f} trabajos/min)'
+            )
+    finally:
+        for executor in executors:
+            executor.shutdown()
+
+    summary = summarize(results, time.monotonic() - started)
+    logging.info(f'Lote terminado: {summary["jobs"]} trabajos en {summary["seconds"]}s '
+                 f'({summary["jobs_per_minute"]} trabajos/min)')
+    for provider, stats in summary['providers'].items():
+        logging.info(f'  {provider}: {stats}')
+    return results, summary
+
+
+def parse_concurrency(values):
+    """Convertir ['omega=3', 'avianca=1'] en {'omega': 3, 'avianca': 1}"""
+    concurrency = {}
+    for value in values:
+        provider, _, workers = value.partition('=')
+        concurrency[provider] = int(workers)
+    return concurrency
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Planificador de búsquedas de viajes')
+    parser.add_argument('--job', action='append', required=True,
+                        help='proveedor:origen:destino (se puede repetir)')
+    parser.add_argument('--start', default=date.today().isoformat(), help='Primera fecha (AAAA-MM-DD)')
+    parser.add_argument('--days', type=int, default=1, help='Número de días a partir de --start')
+    parser.add_argument('--concurrency', action='append', default=[],
+                        help=f'proveedor=N hilos (por defecto {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--sink', action='append', default=[],
+                        help='stdout, jsonl:<ruta>, parquet:<dir> o mongo:<base>/<colección> (se puede repetir)')
+    parser.add_argument('--metrics-file', default=metrics.TEXTFILE,
+                        help='Archivo de texto de Prometheus a escribir al terminar')
+    parser.add_argument('--metrics-port', type=int, help='Exponer /metrics en este puerto mientras corre el lote')
+    parser.add_argument('--summary-json', default=metrics.SUMMARY_FILE,
+                        help='Archivo con el resumen JSON del lote y de las etapas')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'Perfilar el lote (cProfile + pilas de todos los hilos) en {profiling.PROFILE_DIR}/')
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    jobs = []
+    for spec in args.job:
+        provider, origin, destination = spec.split(':')
+        jobs.extend(expand_jobs(provider, [(origin, destination)], args.start, args.days))
+
+    pipeline = None
+    if args.sink:
+        pipeline = Pipeline([sink_from_spec(spec, record_key) for spec in args.sink])
+    summary = None
+    try:
+        with profiling.profiled('scheduler') if args.profile else nullcontext():
+            _, summary = run_jobs(jobs, parse_concurrency(args.concurrency), pipeline)
+    finally:
+        if pipeline is not None:
+            logging.info(f'Pipeline: {pipeline.close()}')
+        if args.metrics_file:
+            metrics.write_textfile(args.metrics_file)
+        if args.summary_json:
+            with open(args.summary_json, 'w', encoding='utf-8') as f:
+                json.dump({'batch': summary, 'stages': metrics.summary()}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()